@@ -0,0 +1,52 @@
+from settings import *
+from os.path import join
+from time import perf_counter
+
+
+class Assets:
+    def __init__(self, folder: str = ASSET_FOLDER) -> None:
+        """
+        Loads fonts and images on first use and shares them between components
+
+        :param folder: folder the asset files are in
+        """
+        self.folder = folder
+        self.fonts = {}
+        self.images = {}
+
+        # seconds spent reading files, for the startup report
+        self.load_time = 0.0
+
+    def font(self, size: int, name: str = FONT_FILE) -> pygame.font.Font:
+        """
+        Returns the font at a size, opening the file the first time that size is asked for
+        :param size: point size
+        :param name: font file name
+        """
+        key = (name, size)
+        if key not in self.fonts:
+            start = perf_counter()
+            self.fonts[key] = pygame.font.Font(join(self.folder, name), size)
+            self.load_time += perf_counter() - start
+        return self.fonts[key]
+
+    def image(self, name: str) -> pygame.Surface:
+        """
+        Returns an image converted for the display, loading it the first time it is asked for
+        :param name: image file name
+        """
+        if name not in self.images:
+            start = perf_counter()
+            self.images[name] = pygame.image.load(join(self.folder, name)).convert_alpha()
+            self.load_time += perf_counter() - start
+        return self.images[name]
+
+    def shape_image(self, shape: str) -> pygame.Surface:
+        """
+        Preview image of a tetromino
+        :param shape: letter of the shape
+        """
+        return self.image(f'{shape}.png')
+
+
+assets = Assets()
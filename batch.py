@@ -0,0 +1,167 @@
+import numpy as np
+
+from settings import COLUMNS, ROWS, TETROMINOS, SCORE_DATA
+from rotation import ROTATIONS
+
+SHAPES = list(TETROMINOS.keys())
+SCORE_TABLE = np.array([0] + [SCORE_DATA[lines] for lines in range(1, 5)], dtype=np.int64)
+
+
+def build_tables() -> tuple:
+    """
+    Packs ROTATIONS into arrays indexed by [shape, rotation, block], normalized so every
+    orientation starts at column 0 and row 0. Shapes with fewer than four orientations repeat them.
+    :return: (dx, dy, width) arrays of shape (7, 4, 4), (7, 4, 4) and (7, 4)
+    """
+    dx = np.zeros((len(SHAPES), 4, 4), dtype=np.int64)
+    dy = np.zeros((len(SHAPES), 4, 4), dtype=np.int64)
+    width = np.zeros((len(SHAPES), 4), dtype=np.int64)
+    for s, shape in enumerate(SHAPES):
+        states = ROTATIONS[shape]
+        for r in range(4):
+            offsets = np.array(states[r % len(states)])
+            offsets -= offsets.min(axis=0)
+            dx[s, r], dy[s, r] = offsets[:, 0], offsets[:, 1]
+            width[s, r] = offsets[:, 0].max() + 1
+    return dx, dy, width
+
+
+DX, DY, WIDTH = build_tables()
+
+
+class BatchEnv:
+    def __init__(self, num_envs: int, seed: int = None) -> None:
+        """
+        Initializes num_envs boards that are stepped in lockstep with array operations
+
+        Actions are placements: rotation * COLUMNS + column, where column is the leftmost
+        column of the piece. Out of range columns are clamped, and the piece is hard dropped.
+        Boards hold 0 for empty cells and the 1-based shape index for locked blocks.
+
+        :param num_envs: number of boards in the batch
+        :param seed: seed for the piece bags
+        """
+        self.num_envs = num_envs
+        self.num_actions = 4 * COLUMNS
+        self.rng = np.random.default_rng(seed)
+        self.env_index = np.arange(num_envs)
+
+        # buffers
+        self.boards = np.zeros((num_envs, ROWS, COLUMNS), dtype=np.uint8)
+        self.pieces = np.zeros(num_envs, dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.lines = np.zeros(num_envs, dtype=np.int64)
+        self.lvl = np.ones(num_envs, dtype=np.int64)
+
+        # piecebag: two bags per env, bag_pos indexes the next piece
+        self.bags = np.zeros((num_envs, 2 * len(SHAPES)), dtype=np.int64)
+        self.bag_pos = np.zeros(num_envs, dtype=np.int64)
+
+        self.reset()
+
+    def new_bags(self, count: int) -> np.ndarray:
+        """
+        Shuffled 7-bags, one per row
+        """
+        return self.rng.permuted(np.tile(np.arange(len(SHAPES)), (count, 1)), axis=1)
+
+    def reset(self, envs: np.ndarray = None) -> tuple:
+        """
+        Clears the selected boards and deals them a fresh piecebag
+        :param envs: boolean mask or indexes of the envs to reset, defaults to all
+        :return: (boards, pieces) observation views
+        """
+        if envs is None:
+            envs = self.env_index
+        count = len(self.env_index[envs])
+
+        self.boards[envs] = 0
+        self.score[envs] = 0
+        self.lines[envs] = 0
+        self.lvl[envs] = 1
+        self.bags[envs] = np.concatenate([self.new_bags(count), self.new_bags(count)], axis=1)
+        self.bag_pos[envs] = 0
+        self.deal(envs)
+        return self.boards, self.pieces
+
+    def deal(self, envs: np.ndarray) -> None:
+        """
+        Pops the next piece from each selected env's bag, refilling bags that run out
+        :param envs: boolean mask or indexes of the envs that need a new piece
+        """
+        idx = self.env_index[envs]
+        self.pieces[idx] = self.bags[idx, self.bag_pos[idx]]
+        self.bag_pos[idx] += 1
+
+        empty = idx[self.bag_pos[idx] == len(SHAPES)]
+        if len(empty):
+            self.bags[empty, :len(SHAPES)] = self.bags[empty, len(SHAPES):]
+            self.bags[empty, len(SHAPES):] = self.new_bags(len(empty))
+            self.bag_pos[empty] = 0
+
+    def next_shapes(self, depth: int = 3) -> np.ndarray:
+        """
+        Upcoming pieces for every env, up to one full bag ahead
+        :param depth: number of pieces to look ahead, at most 7
+        :return: (num_envs, depth) array of shape indexes
+        """
+        cols = self.bag_pos[:, None] + np.arange(depth)[None, :]
+        return np.take_along_axis(self.bags, cols, axis=1)
+
+    def surface(self) -> np.ndarray:
+        """
+        Index of the highest filled row in each column, ROWS for empty columns
+        :return: (num_envs, COLUMNS) array
+        """
+        filled = self.boards != 0
+        return np.where(filled.any(axis=1), filled.argmax(axis=1), ROWS)
+
+    def step(self, actions: np.ndarray) -> tuple:
+        """
+        Hard drops every env's piece with its placement, clears lines and scores the batch
+
+        :param actions: (num_envs,) array of rotation * COLUMNS + column
+        :return: (boards, pieces, rewards, dones, info) where boards and pieces are views of the
+                 batch buffers and info holds the final score, lines and level of finished games
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        rotation = (actions // COLUMNS) % 4
+        shape = self.pieces
+        column = np.clip(actions % COLUMNS, 0, COLUMNS - WIDTH[shape, rotation])
+
+        # landing row: the piece stops one above the first filled cell under any of its blocks
+        cols = column[:, None] + DX[shape, rotation]
+        rows = DY[shape, rotation]
+        tops = np.take_along_axis(self.surface(), cols, axis=1)
+        rows = (tops - 1 - rows).min(axis=1)[:, None] + rows
+
+        # lock, blocks above the board top out the game
+        dones = (rows < 0).any(axis=1)
+        placed = ~dones
+        self.boards[self.env_index[placed, None], rows[placed], cols[placed]] = shape[placed, None] + 1
+
+        # line clears: full rows are sorted to the top then emptied
+        full = (self.boards != 0).all(axis=2)
+        cleared = full.sum(axis=1)
+        clearing = np.nonzero(cleared)[0]
+        if len(clearing):
+            order = np.argsort(~full[clearing], axis=1, kind='stable')
+            boards = np.take_along_axis(self.boards[clearing], order[:, :, None], axis=1)
+            boards[np.arange(ROWS)[None, :] < cleared[clearing, None]] = 0
+            self.boards[clearing] = boards
+
+        # score
+        rewards = SCORE_TABLE[cleared] * self.lvl
+        self.score += rewards
+        self.lines += cleared
+        self.lvl += (cleared > 0) & (self.lines / 10 > self.lvl)
+
+        info = {
+            'score': self.score[dones].copy(),
+            'lines': self.lines[dones].copy(),
+            'lvl': self.lvl[dones].copy(),
+        }
+        self.deal(placed)
+        if dones.any():
+            self.reset(dones)
+        return self.boards, self.pieces, rewards, dones, info
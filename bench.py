@@ -0,0 +1,175 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from settings import *
+from random import Random
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+from engine import Engine
+from game import Game
+from main import Main
+from randomizer import GENERATORS, Randomizer
+from scorestore import ScoreStore
+
+
+def measure(func: callable, setup: callable = None, runs: int = 200) -> dict:
+    """
+    Times a function, calling setup untimed before every run
+    :return: dict of timings in microseconds
+    """
+    times = []
+    for run in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        func()
+        times.append((time.perf_counter_ns() - start) / 1000)
+    times.sort()
+    return {
+        'runs': runs,
+        'mean_us': sum(times) / runs,
+        'min_us': times[0],
+        'p50_us': times[runs // 2],
+        'p99_us': times[min(runs - 1, runs * 99 // 100)],
+    }
+
+
+def dense_board(engine: Engine, rows: int, seed: int = 0) -> None:
+    """
+    Fills the bottom rows of an engine's board, each with a single gap
+    """
+    rng = Random(seed)
+    for y in range(ROWS - rows, ROWS):
+        gap = rng.randrange(COLUMNS)
+        engine.board.place([(x, y) for x in range(COLUMNS) if x != gap], 'T')
+
+
+def new_game(seed: int = 0) -> Game:
+    return Game(Randomizer(seed).get_next_shape, None)
+
+
+def bench_engine(results: dict) -> None:
+    # line clears on a dense board: four full rows out of sixteen
+    engine = Engine(lambda: 'I', first_shape='I')
+    dense_board(engine, 16)
+    full_rows = list(range(ROWS - 4, ROWS))
+    board = engine.board
+
+    def fill():
+        engine.board = board.copy()
+        for y in full_rows:
+            engine.board.place([(x, y) for x in range(COLUMNS)], 'I')
+    results['engine.check_finished_rows dense'] = measure(lambda: engine.check_finished_rows(full_rows), fill, 2000)
+
+    # rotation and collision helpers with the piece over a half-full board
+    engine = Engine(lambda: 'T', first_shape='T')
+    dense_board(engine, 10)
+    engine.piece.y = 5
+    results['engine.rotate'] = measure(engine.rotate, runs=5000)
+    results['board.collides_mask'] = measure(
+        lambda: engine.board.collides_mask(engine.piece.mask, engine.piece.x, engine.piece.y + 1), runs=5000)
+    results['board.collides'] = measure(lambda: engine.board.collides(engine.piece.cells), runs=5000)
+
+
+def bench_randomizer(results: dict) -> None:
+    for generator in GENERATORS:
+        randomizer = Randomizer(0, generator)
+        results[f'randomizer.get_next_shape {generator}'] = measure(randomizer.get_next_shape, runs=5000)
+        results[f'randomizer.peek 100 {generator}'] = measure(lambda: randomizer.peek(100), runs=2000)
+        results[f'randomizer.generate 100000 {generator}'] = measure(lambda: randomizer.generate(100000), runs=5)
+
+
+def bench_game(results: dict) -> None:
+    for name, rows in (('empty', 0), ('full', 16)):
+        game = new_game()
+        dense_board(game.engine, rows)
+        game.render_board()
+        game.engine.piece.y = 0
+
+        def force():
+            game.full_redraw = True
+        results[f'game.run full frame {name}'] = measure(lambda: game.run(0), force)
+
+        def shift():
+            game.engine.piece.x = 3 if game.engine.piece.x == 4 else 4
+        results[f'game.run piece moved {name}'] = measure(lambda: game.run(0), shift)
+
+
+def bench_panels(results: dict, main: Main) -> None:
+    def reset_score():
+        main.score.drawn_values = None
+    results['score.run'] = measure(main.score.run, reset_score)
+    results['score.run unchanged'] = measure(main.score.run)
+
+    def reset_preview():
+        main.preview.drawn_shapes = None
+    results['preview.run'] = measure(main.preview.run, reset_preview)
+
+
+def bench_high_scores(results: dict, path: str, rows: int) -> Main:
+    store = ScoreStore(path)
+    rng = Random(0)
+    store.add_many([(f'player{rng.randrange(1000)}', rng.randrange(100000), 1, 1) for row in range(rows)])
+    store.close()
+
+    start = time.perf_counter()
+    main = Main(path)
+    results[f'main.__init__ {rows} scores'] = {'runs': 1, 'mean_us': (time.perf_counter() - start) * 1e6}
+    main.state = 'high_scores'
+    results[f'main.run_high_scores {rows} scores'] = measure(lambda: main.run_high_scores([]))
+    return main
+
+
+def run_benchmarks(score_rows: int) -> dict:
+    results = {}
+    bench_engine(results)
+    bench_randomizer(results)
+    with tempfile.TemporaryDirectory() as folder:
+        main = bench_high_scores(results, os.path.join(folder, 'scoreboard.db'), score_rows)
+        bench_game(results)
+        bench_panels(results, main)
+        main.leaderboard.store.close()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Finds benchmarks whose median got slower than the baseline by more than threshold
+    :return: list of (name, baseline_us, current_us)
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and 'p50_us' in result:
+            before = baseline[name]['p50_us']
+            if result['p50_us'] > before * (1 + threshold):
+                regressions.append((name, before, result['p50_us']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark engine hot paths and frame rendering')
+    parser.add_argument('--out', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before a regression, 0.2 = 20%%')
+    parser.add_argument('--scores', type=int, default=50000, help='rows in the benchmark scoreboard')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scores)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for name, before, after in regressions:
+            print(f'REGRESSION {name}: {before:.1f}us -> {after:.1f}us', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,211 @@
+from settings import *
+from rotation import BOTTOMS
+from zobrist import CELL_KEYS, ROW_KEYS, board_hash
+
+# shapes are stored in the color plane as their 1-based index in TETROMINOS
+SHAPES = list(TETROMINOS.keys())
+COLORS = [0] + [TETROMINOS[shape]['color'] for shape in SHAPES]
+FULL_ROW = (1 << COLUMNS) - 1
+
+
+class BitBoard:
+    def __init__(self) -> None:
+        """
+        Initializes an empty board stored as one integer bitmask per row plus a color plane.
+        Column bitmasks and the surface features derived from them are kept up to date on
+        every place and clear, so reading them never scans the board.
+        """
+        self.rows = [0 for y in range(ROWS)]
+        self.colors = [bytearray(COLUMNS) for y in range(ROWS)]
+
+        # bit y of a column is set when the cell on row y is filled
+        self.columns = [0 for x in range(COLUMNS)]
+
+        # Zobrist hash of the filled cells
+        self.hash = 0
+
+        # features
+        self.heights = [0 for x in range(COLUMNS)]
+        self.column_holes = [0 for x in range(COLUMNS)]
+        self.aggregate_height = 0
+        self.holes = 0
+        self.bumpiness = 0
+
+    @staticmethod
+    def row_masks(cells: list) -> dict:
+        """
+        Groups a set of cells into per-row bitmasks
+        :param cells: list of (x, y) tuples
+        :return: dict mapping y to the bitmask of the cells on that row
+        """
+        masks = {}
+        for x, y in cells:
+            masks[y] = masks.get(y, 0) | (1 << x)
+        return masks
+
+    def collides(self, cells: list) -> bool:
+        """
+        Checks a set of cells against the board edges and locked blocks
+        :param cells: list of (x, y) tuples
+        :return: True if any cell is out of bounds or occupied
+        """
+        for x, y in cells:
+            if not 0 <= x < COLUMNS or y >= ROWS:
+                return True
+
+        rows = self.rows
+        for y, mask in self.row_masks(cells).items():
+            if y >= 0 and rows[y] & mask:
+                return True
+        return False
+
+    def collides_mask(self, mask: tuple, x: int, y: int) -> bool:
+        """
+        Checks a precomputed piece mask against the board edges and locked blocks
+        :param mask: (left, right, bottom, rows) tuple from rotation.MASKS
+        :param x: x-coord of the piece's pivot
+        :param y: y-coord of the piece's pivot
+        :return: True if any block is out of bounds or occupied
+        """
+        left, right, bottom, masks = mask
+        if x + left < 0 or x + right >= COLUMNS or y + bottom >= ROWS:
+            return True
+
+        rows = self.rows
+        shift = x + left
+        for dy, bits in masks:
+            if y + dy >= 0 and rows[y + dy] & (bits << shift):
+                return True
+        return False
+
+    def place(self, cells: list, shape: str) -> list:
+        """
+        Writes cells into the board
+        :param cells: list of (x, y) tuples, all inside the board
+        :param shape: letter of the shape the cells belong to
+        :return: sorted list of the rows that are now full
+        """
+        value = SHAPES.index(shape) + 1
+        rows = self.rows
+        columns = self.columns
+        for x, y in cells:
+            if not rows[y] >> x & 1:
+                self.hash ^= CELL_KEYS[y][x]
+            rows[y] |= 1 << x
+            columns[x] |= 1 << y
+            self.colors[y][x] = value
+
+        self.update_features({x for x, y in cells})
+        return sorted(y for y in {y for x, y in cells} if rows[y] == FULL_ROW)
+
+    def clear_rows(self, full_rows: list) -> None:
+        """
+        Removes rows and drops everything above them
+        :param full_rows: indexes of the rows to remove
+        """
+        for y in sorted(full_rows, reverse=True):
+            del self.rows[y]
+            del self.colors[y]
+        self.rows[:0] = [0 for y in full_rows]
+        self.colors[:0] = [bytearray(COLUMNS) for y in full_rows]
+
+        # every column drops the cleared bits and shifts the bits above them down a row
+        columns = self.columns
+        for y in sorted(full_rows):
+            below = ~((1 << (y + 1)) - 1)
+            above = (1 << y) - 1
+            for x in range(COLUMNS):
+                columns[x] = (columns[x] & below) | ((columns[x] & above) << 1)
+        if full_rows:
+            self.update_features(range(COLUMNS))
+            self.hash = board_hash(self.rows)
+
+    def load_row(self, y: int, values: bytes) -> None:
+        """
+        Overwrites a whole row, used to mirror a board received from elsewhere
+        :param y: index of the row
+        :param values: COLUMNS shape indexes, 0 for empty cells
+        """
+        mask = 0
+        for x, value in enumerate(values):
+            if value:
+                mask |= 1 << x
+        old = self.rows[y]
+        self.rows[y] = mask
+        self.colors[y] = bytearray(values)
+        self.hash ^= ROW_KEYS[y][old] ^ ROW_KEYS[y][mask]
+
+        changed = [x for x in range(COLUMNS) if (old ^ mask) >> x & 1]
+        for x in changed:
+            self.columns[x] ^= 1 << y
+        self.update_features(changed)
+
+    def update_features(self, changed: set) -> None:
+        """
+        Recomputes the height and holes of changed columns from their bitmasks and
+        adjusts the board totals by the difference
+        :param changed: x-coords of the columns that changed
+        """
+        heights = self.heights
+        bumps = {x for c in changed for x in (c - 1, c) if 0 <= x < COLUMNS - 1}
+        bumpiness = sum(abs(heights[x] - heights[x + 1]) for x in bumps)
+
+        for x in changed:
+            column = self.columns[x]
+            height = ROWS - ((column & -column).bit_length() - 1) if column else 0
+            holes = height - bin(column).count('1')
+            self.aggregate_height += height - heights[x]
+            self.holes += holes - self.column_holes[x]
+            heights[x] = height
+            self.column_holes[x] = holes
+
+        self.bumpiness += sum(abs(heights[x] - heights[x + 1]) for x in bumps) - bumpiness
+
+    def drop_distance(self, shape: str, rotation: int, x: int, y: int) -> int:
+        """
+        How far a piece can fall, from the first filled cell below each of its columns
+        :param shape: letter of the piece's shape
+        :param rotation: rotation index of the piece
+        :param x: x-coord of the piece's pivot
+        :param y: y-coord of the piece's pivot
+        :return: number of rows the piece can move down
+        """
+        distances = []
+        for dx, dy in BOTTOMS[shape][rotation]:
+            bottom = y + dy
+            column = self.columns[x + dx]
+            if bottom >= 0:
+                column = column >> (bottom + 1) << (bottom + 1)
+            floor = (column & -column).bit_length() - 1 if column else ROWS
+            distances.append(floor - 1 - bottom)
+        return min(distances)
+
+    def get(self, x: int, y: int) -> str:
+        """
+        Color of a single cell
+        :return: color string, or 0 if the cell is empty
+        """
+        return COLORS[self.colors[y][x]]
+
+    @property
+    def field_data(self) -> list:
+        """
+        Board as a list of rows of colors (0 for empty cells)
+        """
+        return [[COLORS[value] for value in row] for row in self.colors]
+
+    def copy(self) -> 'BitBoard':
+        """
+        Independent copy of the board
+        """
+        board = BitBoard.__new__(BitBoard)
+        board.rows = self.rows[:]
+        board.colors = [row[:] for row in self.colors]
+        board.columns = self.columns[:]
+        board.hash = self.hash
+        board.heights = self.heights[:]
+        board.column_holes = self.column_holes[:]
+        board.aggregate_height = self.aggregate_height
+        board.holes = self.holes
+        board.bumpiness = self.bumpiness
+        return board
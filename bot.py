@@ -0,0 +1,126 @@
+from settings import *
+import time
+
+from engine import Engine
+from randomizer import Randomizer
+from search import SPAWN, placements
+from zobrist import EvalCache, state_hash
+
+# weights for a linear evaluation of the board left by a placement
+DEFAULT_WEIGHTS = {'height': -0.51, 'lines': 0.76, 'holes': -0.36, 'bumpiness': -0.18}
+
+
+def board_features(board) -> dict:
+    """
+    Surface features of a BitBoard, maintained by the board as pieces lock and rows clear
+    :return: dict with the aggregate column height, hole count and bumpiness
+    """
+    return {'height': board.aggregate_height, 'holes': board.holes, 'bumpiness': board.bumpiness}
+
+
+def evaluate_board(board, weights: dict) -> float:
+    """
+    Weighted sum of a board's surface features
+    :param board: BitBoard
+    :param weights: dict of feature weights
+    """
+    return sum(weights[name] * value for name, value in board_features(board).items())
+
+
+def evaluate(placement, weights: dict) -> float:
+    """
+    Scores a placement, higher is better
+    :param placement: search.Placement
+    :param weights: dict of feature weights
+    """
+    if placement.tops_out:
+        return float('-inf')
+    return evaluate_board(placement.board, weights) + weights['lines'] * placement.lines
+
+
+def search(board, shape: str, cache: EvalCache = None) -> list:
+    """
+    Placements of a piece spawned on the board, looked up by the board and piece hash when cached.
+    With lookahead, the board the bot locks into is one it already searched for the previewed
+    piece, so the next turn's search is a cache hit.
+
+    :param board: BitBoard
+    :param shape: letter of the piece's shape
+    :param cache: EvalCache of placement lists
+    :return: list of search.Placement
+    """
+    if cache is None:
+        return placements(board, shape)
+    return cache.lookup(state_hash(board, shape), lambda: placements(board, shape))
+
+
+def best_followup(board, shape: str, weights: dict, cache: EvalCache = None) -> float:
+    """
+    Score of the best placement of a previewed piece on the board a placement left behind
+    :param board: BitBoard
+    :param shape: letter of the previewed piece's shape
+    :param cache: EvalCache of placement lists
+    """
+    return max((evaluate(option, weights) for option in search(board, shape, cache)), default=float('-inf'))
+
+
+def choose(engine: Engine, weights: dict, next_shape: str = None, cache: EvalCache = None):
+    """
+    Picks the best reachable placement for the engine's active piece
+    :param next_shape: previewed piece to look one placement ahead with
+    :param cache: EvalCache of placement lists, used while the piece is at its spawn position
+    :return: search.Placement, or None if the piece cannot move
+    """
+    piece = engine.piece
+    start = (piece.rotation, piece.x, piece.y)
+    if start == SPAWN:
+        options = search(engine.board, piece.shape, cache)
+    else:
+        options = placements(engine.board, piece.shape, start)
+    if not options:
+        return None
+    if next_shape is None:
+        return max(options, key=lambda placement: evaluate(placement, weights))
+
+    def score(placement) -> float:
+        if placement.tops_out:
+            return float('-inf')
+        return weights['lines'] * placement.lines + best_followup(placement.board, next_shape, weights, cache)
+    return max(options, key=score)
+
+
+def play_game(seed: int, weights: dict = None, max_pieces: int = 1000, lookahead: bool = False) -> dict:
+    """
+    Plays a headless game with the bot, dealing pieces the same way Main does
+
+    :param seed: randomizer seed
+    :param weights: dict of feature weights, defaults to DEFAULT_WEIGHTS
+    :param max_pieces: stop after this many pieces if the bot has not topped out
+    :param lookahead: also place the first previewed piece before scoring a placement
+    :return: dict with the seed, score, lines, level, pieces, run time in seconds and, with lookahead,
+             the search cache hit rate
+    """
+    weights = weights if weights else DEFAULT_WEIGHTS
+    # only lookahead searches boards a later turn can reuse
+    cache = EvalCache() if lookahead else None
+    start = time.perf_counter()
+
+    randomizer = Randomizer(seed)
+    engine = Engine(randomizer.get_next_shape)
+    while not engine.game_over and engine.pieces < max_pieces:
+        placement = choose(engine, weights, randomizer.peek(1)[0] if lookahead else None, cache)
+        if placement is None:
+            engine.game_over = True
+            break
+        engine.piece.rotation, engine.piece.x, engine.piece.y = placement.rotation, placement.x, placement.y
+        engine.lock()
+
+    return {
+        'seed': seed,
+        'score': engine.current_score,
+        'lines': engine.current_lines,
+        'lvl': engine.current_lvl,
+        'pieces': engine.pieces,
+        'time': time.perf_counter() - start,
+        'cache_hit_rate': cache.hit_rate if cache is not None else None,
+    }
@@ -0,0 +1,167 @@
+from settings import *
+import select
+import socket
+
+from game import Game
+from engine import Piece
+from controls import encode_keys
+from protocol import *
+from events import EventBus, PieceSpawned, LinesCleared, LevelUp, GameOver
+
+
+class NetClient:
+    def __init__(self, host: str, port: int, name: str) -> None:
+        """
+        Connection to a game server that is polled from the pygame loop without blocking it
+
+        :param host: server address
+        :param port: server port
+        :param name: player name sent with the join message
+        """
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.frames = FrameBuffer()
+        self.closed = False
+        self.send(MSG_JOIN, name.encode('utf-8'))
+
+    def send(self, kind: int, payload: bytes = b'') -> None:
+        try:
+            self.socket.sendall(frame(kind, payload))
+        except OSError:
+            self.closed = True
+
+    def poll(self) -> list:
+        """
+        Reads whatever has arrived
+        :return: list of (type, payload) messages
+        """
+        messages = []
+        while not self.closed and select.select([self.socket], [], [], 0)[0]:
+            try:
+                data = self.socket.recv(65536)
+            except OSError:
+                data = b''
+            if not data:
+                self.closed = True
+                break
+            messages += self.frames.feed(data)
+        return messages
+
+    def close(self) -> None:
+        self.closed = True
+        self.socket.close()
+
+
+class RemoteGame(Game):
+    def __init__(self, host: str, port: int, name: str, events: EventBus = None) -> None:
+        """
+        Renders a game that runs on a server, mirroring its board into a local engine that
+        never steps on its own so Game.draw can be reused unchanged
+
+        :param host: server address
+        :param port: server port
+        :param name: player name
+        :param events: bus the changes seen in the received states are published on
+        """
+        # preview queue of the server's randomizer, the engine's first piece is dealt from it
+        self.next_shapes = []
+        super().__init__(self.next_shape, events)
+        self.host = host
+        self.port = port
+        self.name = name
+
+        # connected on the first update, so a game set up ahead of time does not join yet
+        self.connection = None
+        self.session = None
+        self.seed = None
+        self.sent_mask = None
+
+    def next_shape(self) -> str:
+        return self.next_shapes[0] if self.next_shapes else 'O'
+
+    def advance(self, dt: float, keys=None) -> int:
+        """
+        Sends the key state if it changed and applies the states the server sent
+        :param dt: unused, the server keeps time
+        :param keys: key state, read from the input handler or polled from pygame if omitted
+        :return: number of states applied
+        """
+        if self.connection is None:
+            try:
+                self.connection = NetClient(self.host, self.port, self.name)
+            except OSError:
+                # an unreachable server ends the game like losing it does
+                self.engine.game_over = True
+                self.emit_game_over()
+                return 0
+        if keys is not None or self.input_handler is None:
+            held = encode_keys(keys if keys is not None else pygame.key.get_pressed())
+            pressed = held & ~(self.sent_mask or 0)
+        else:
+            held, pressed = self.input_handler.tick(self.input_handler.now())
+
+        # taps are sent even when the held keys are back to what the server already has
+        if held != self.sent_mask or pressed:
+            self.connection.send(MSG_INPUT, INPUT.pack(held, pressed))
+            self.sent_mask = held
+
+        states = 0
+        for kind, payload in self.connection.poll():
+            if kind == MSG_WELCOME:
+                self.session, self.seed = WELCOME.unpack(payload)
+            elif kind == MSG_STATE:
+                self.apply(decode_state(payload))
+                states += 1
+
+        # losing the server ends the game
+        if self.connection.closed and not self.engine.game_over:
+            self.engine.game_over = True
+            self.emit_game_over()
+        return states
+
+    def release_keys(self) -> None:
+        """
+        Tells the server no keys are held, for when local input stops, e.g. on losing focus
+        """
+        if self.connection and self.sent_mask:
+            self.connection.send(MSG_INPUT, INPUT.pack(0, 0))
+            self.sent_mask = 0
+
+    def emit_game_over(self) -> None:
+        engine = self.engine
+        engine.emit(GameOver, engine.current_score, engine.current_lines, engine.current_lvl, engine.pieces)
+
+    def apply(self, state: dict) -> None:
+        """
+        Copies a received state into the mirror engine and publishes the events it implies
+        :param state: dict from protocol.decode_state()
+        """
+        engine = self.engine
+        for y, row in state['rows']:
+            engine.board.load_row(y, row)
+        engine.locked_cells = [(x, y) for y, row in state['rows'] for x, value in enumerate(row) if value]
+        first = not self.next_shapes
+        self.next_shapes = state['next_shapes']
+
+        if first or state['pieces'] != engine.pieces or state['shape'] != engine.piece.shape:
+            engine.pieces = state['pieces']
+            engine.piece = Piece(state['shape'])
+            self.create_new_tetromino()
+            engine.emit(PieceSpawned, state['shape'])
+        engine.piece.rotation, engine.piece.x, engine.piece.y = state['rotation'], state['x'], state['y']
+
+        if state['lines'] != engine.current_lines:
+            cleared = state['lines'] - engine.current_lines
+            engine.current_lines, engine.current_score = state['lines'], state['score']
+            engine.emit(LinesCleared, cleared, state['lines'], state['score'])
+        if state['lvl'] != engine.current_lvl:
+            engine.current_lvl = state['lvl']
+            engine.emit(LevelUp, state['lvl'], engine.down_speed)
+
+        if state['game_over'] and not engine.game_over:
+            engine.game_over = True
+            self.emit_game_over()
+
+    def close(self) -> None:
+        if self.connection:
+            self.connection.close()
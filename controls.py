@@ -0,0 +1,102 @@
+from settings import *
+from collections import deque
+from time import perf_counter
+
+# bit order of the key masks the game logic, replays and the server use
+INPUT_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_SPACE)
+LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP = (1 << bit for bit in range(len(INPUT_KEYS)))
+KEY_BITS = {key: 1 << bit for bit, key in enumerate(INPUT_KEYS)}
+
+
+def encode_keys(keys) -> int:
+    """
+    Packs the keys the game reads into a bitmask
+    :param keys: key state indexed by pygame key constants
+    :return: bitmask following INPUT_KEYS
+    """
+    mask = 0
+    for bit, key in enumerate(INPUT_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+
+class InputHandler:
+    def __init__(self, samples: int = LATENCY_SAMPLES) -> None:
+        """
+        Collects timestamped KEYDOWN and KEYUP events and hands them to the game tick they
+        happened in, so taps shorter than a frame still register and moves are not delayed
+        to the next poll. Also measures the time from a key press to the frame showing it.
+
+        :param samples: number of latency measurements kept
+        """
+        self.events = deque()
+        self.held = 0
+
+        # press times consumed by a tick but not on screen yet
+        self.pending = []
+        self.latencies = deque(maxlen=samples)
+
+    @staticmethod
+    def now() -> float:
+        return perf_counter() * 1000
+
+    def handle(self, event: pygame.event.Event) -> bool:
+        """
+        Queues a key event with the time it was read
+        :return: True if the event is one of INPUT_KEYS
+        """
+        if event.type not in (pygame.KEYDOWN, pygame.KEYUP) or event.key not in KEY_BITS:
+            return False
+        self.events.append((self.now(), KEY_BITS[event.key], event.type == pygame.KEYDOWN))
+        return True
+
+    def tick(self, end: float) -> tuple:
+        """
+        Applies the events that happened up to the end of a tick
+        :param end: time the tick covers up to, in InputHandler.now() milliseconds
+        :return: (held, pressed) masks, pressed holding every key that went down during the tick
+        """
+        pressed = 0
+        events = self.events
+        while events and events[0][0] <= end:
+            time, bit, down = events.popleft()
+            if down:
+                if not self.held & bit:
+                    pressed |= bit
+                    self.pending.append(time)
+                self.held |= bit
+            else:
+                self.held &= ~bit
+        return self.held, pressed
+
+    def presented(self) -> None:
+        """
+        Records the latency of every press applied since the last frame, call after the display update
+        """
+        now = self.now()
+        self.latencies.extend(now - time for time in self.pending)
+        self.pending.clear()
+
+    def reset(self) -> None:
+        """
+        Forgets queued events and held keys, for a new game
+        """
+        self.events.clear()
+        self.pending.clear()
+        self.held = 0
+
+    def latency_stats(self) -> dict:
+        """
+        Input-to-frame latency over the kept samples
+        :return: dict with the sample count and the p50, p95 and max latency in milliseconds
+        """
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return {'count': 0}
+        return {
+            'count': len(ordered),
+            'p50': ordered[len(ordered) // 2],
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            'max': ordered[-1],
+        }
@@ -0,0 +1,213 @@
+from settings import *
+from board import BitBoard
+from rotation import ROTATIONS, MASKS, rotate_with_kicks
+from events import EventBus, PieceSpawned, PieceLocked, LinesCleared, LevelUp, GameOver
+
+
+class Piece:
+    def __init__(self, shape: str) -> None:
+        """
+        Initializes a headless tetromino at the spawn position
+
+        :param shape: The shape of the tetromino
+        """
+        self.shape = shape
+        self.color = TETROMINOS[shape]['color']
+        self.rotation = 0
+
+        # position of the pivot block
+        self.x = int(BLOCK_OFFSET.x)
+        self.y = int(BLOCK_OFFSET.y)
+
+    @property
+    def offsets(self) -> list:
+        """
+        Block offsets from the pivot for the current rotation
+        """
+        return ROTATIONS[self.shape][self.rotation]
+
+    @property
+    def mask(self) -> tuple:
+        """
+        Precomputed row bitmasks for the current rotation
+        """
+        return MASKS[self.shape][self.rotation]
+
+    @property
+    def cells(self) -> list:
+        """
+        Board coordinates of every block in the piece
+        :return: list of (x, y) tuples
+        """
+        return [(self.x + dx, self.y + dy) for dx, dy in self.offsets]
+
+
+class Engine:
+    def __init__(self, get_next_shape: callable, events: EventBus = None, first_shape: str = None) -> None:
+        """
+        Initializes the board-state and the first piece without touching pygame surfaces
+
+        :param get_next_shape: Callback returning the letter of the next shape
+        :param events: Optional bus the spawn, lock, clear, level and game over events are published on
+        :param first_shape: Shape of the first piece, pulled from get_next_shape if omitted
+        """
+        # game connections
+        self.get_next_shape = get_next_shape
+        self.events = events
+
+        # board
+        self.board = BitBoard()
+        self.game_over = False
+        self.pieces = 0
+        self.locked_cells = []
+
+        # speed
+        self.down_speed = UPDATE_START_SPEED
+        self.down_speed_faster = self.down_speed * 0.3
+
+        # score
+        self.current_lvl = 1
+        self.current_score = 0
+        self.current_lines = 0
+
+        self.piece = Piece(first_shape if first_shape else self.get_next_shape())
+
+    @property
+    def field_data(self) -> list:
+        """
+        Board as a list of rows of colors (0 for empty cells), built from the bitboard
+        """
+        return self.board.field_data
+
+    # Collisions
+    def collides(self, cells: list) -> bool:
+        """
+        Checks a set of cells against the board edges and locked blocks
+        :param cells: list of (x, y) tuples
+        :return: True if any cell is out of bounds or occupied
+        """
+        return self.board.collides(cells)
+
+    def drop_distance(self) -> int:
+        """
+        Number of rows the active piece can fall before it lands
+        """
+        piece = self.piece
+        return self.board.drop_distance(piece.shape, piece.rotation, piece.x, piece.y)
+
+    # Movement
+    def move_horizontal(self, amount: int) -> bool:
+        """
+        Moves the active piece left or right
+        :param amount: direction of move
+        :return: True if the piece moved
+        """
+        piece = self.piece
+        if self.game_over or self.board.collides_mask(piece.mask, piece.x + amount, piece.y):
+            return False
+        piece.x += amount
+        return True
+
+    def move_down(self) -> bool:
+        """
+        Moves the active piece down or locks it and spawns a new one if unable to
+        :return: True if the piece moved
+        """
+        piece = self.piece
+        if self.game_over:
+            return False
+        if self.board.collides_mask(piece.mask, piece.x, piece.y + 1):
+            self.lock()
+            return False
+        piece.y += 1
+        return True
+
+    def rotate(self) -> bool:
+        """
+        Spins the active piece 90 degrees clockwise around its first block, trying each wall kick in turn
+        :return: True if the piece rotated
+        """
+        piece = self.piece
+        if self.game_over:
+            return False
+
+        rotated = rotate_with_kicks(self.board, piece.shape, piece.rotation, piece.x, piece.y)
+        if rotated is None:
+            return False
+        piece.rotation, piece.x, piece.y = rotated
+        return True
+
+    def hard_drop(self) -> int:
+        """
+        Moves the active piece straight down to where it lands and locks it
+        :return: number of rows dropped
+        """
+        if self.game_over:
+            return 0
+        distance = self.drop_distance()
+        self.piece.y += distance
+        self.lock()
+        return distance
+
+    # Events
+    def emit(self, event_type: type, *fields) -> None:
+        """
+        Publishes an event, only building it if something is subscribed to its type
+        """
+        if self.events is not None and self.events.wants(event_type):
+            self.events.publish(event_type(*fields))
+
+    # Locking
+    def lock(self) -> None:
+        """
+        Writes the active piece into the board, clears rows and spawns the next piece
+        """
+        cells = self.piece.cells
+        if any(y < 0 for x, y in cells):
+            self.game_over = True
+            cells = [(x, y) for x, y in cells if y >= 0]
+
+        self.pieces += 1
+        self.locked_cells = cells
+        self.check_finished_rows(self.board.place(cells, self.piece.shape))
+        self.emit(PieceLocked, self.piece.shape, cells, self.pieces)
+        if not self.game_over:
+            self.spawn()
+        if self.game_over:
+            self.emit(GameOver, self.current_score, self.current_lines, self.current_lvl, self.pieces)
+
+    def spawn(self) -> None:
+        """
+        Makes the next piece active, ending the game if it overlaps the stack
+        """
+        self.piece = Piece(self.get_next_shape())
+        if self.board.collides_mask(self.piece.mask, self.piece.x, self.piece.y):
+            self.game_over = True
+        self.emit(PieceSpawned, self.piece.shape)
+
+    def check_finished_rows(self, full_rows: list) -> int:
+        """
+        Handles deletion of completed rows
+        :param full_rows: rows reported full by the board when the piece was placed
+        :return: number of rows cleared
+        """
+        if full_rows:
+            self.board.clear_rows(full_rows)
+            self.calc_score(len(full_rows))
+        return len(full_rows)
+
+    def calc_score(self, num_lines: int) -> None:
+        """
+        Updates score variables when lines are cleared
+
+        :param num_lines (int): number of lines to use for updates
+        """
+        self.current_lines += num_lines
+        self.current_score += SCORE_DATA[num_lines] * self.current_lvl
+        self.emit(LinesCleared, num_lines, self.current_lines, self.current_score)
+
+        if self.current_lines / 10 > self.current_lvl:
+            self.current_lvl += 1
+            self.down_speed *= 0.80
+            self.down_speed_faster = self.down_speed * 0.3
+            self.emit(LevelUp, self.current_lvl, self.down_speed)
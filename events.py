@@ -0,0 +1,59 @@
+from typing import NamedTuple
+
+
+class PieceSpawned(NamedTuple):
+    shape: str
+
+
+class PieceLocked(NamedTuple):
+    shape: str
+    cells: list
+    pieces: int
+
+
+class LinesCleared(NamedTuple):
+    count: int
+    lines: int
+    score: int
+
+
+class LevelUp(NamedTuple):
+    lvl: int
+    down_speed: float
+
+
+class GameOver(NamedTuple):
+    score: int
+    lines: int
+    lvl: int
+    pieces: int
+
+
+class EventBus:
+    def __init__(self) -> None:
+        """
+        Delivers game events to the handlers subscribed to their type. Emitters check wants()
+        before building an event, so event types nobody listens to cost a dict lookup.
+        """
+        self.handlers = {}
+
+    def subscribe(self, event_type: type, handler: callable) -> None:
+        """
+        :param event_type: one of the event classes in this module
+        :param handler: called with each event of that type
+        """
+        self.handlers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type: type, handler: callable) -> None:
+        handlers = self.handlers.get(event_type, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self.handlers.pop(event_type, None)
+
+    def wants(self, event_type: type) -> bool:
+        return event_type in self.handlers
+
+    def publish(self, event) -> None:
+        for handler in self.handlers.get(type(event), ()):
+            handler(event)
@@ -1,334 +1,379 @@
-from pydoc import browse
-from symtable import Class
-
 from settings import *
-from random import choice
-from timer import Timer
+from timer import Timer, VirtualClock
+from engine import Engine
+from events import EventBus
+from controls import LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP, encode_keys
 
 
-class Game:
-    def __init__(self, get_next_shape, update_score) -> None:
+class GameLogic:
+    def __init__(self, get_next_shape, events: EventBus = None, clock: callable = None,
+                 das: float = DAS, arr: float = ARR) -> None:
         """
-        Initializes class variables and board-state
+        Initializes the engine and the timers that turn key state into moves, without any surfaces,
+        so it can run headless
+
+        :param events: bus the engine publishes game events on
+        :param clock: millisecond clock for the timers, defaults to a VirtualClock advanced by advance()
+        :param das: milliseconds a sideways key is held before it auto-repeats
+        :param arr: milliseconds between auto-repeated moves, 0 moves to the wall at once
         """
 
-        # General Settings
-        self.surface = pygame.Surface((GAME_WIDTH,GAME_HEIGHT))
-        self.display_surface = pygame.display.get_surface()
-        self.rect = self.surface.get_rect(topleft = (PADDING, PADDING))
-        self.sprites = pygame.sprite.Group()
+        # engine, the first piece is dealt by get_next_shape like every other
+        self.engine = Engine(get_next_shape, events)
 
-        # game connections
-        self.get_next_shape = get_next_shape
-        self.update_score = update_score
+        # optional replay.Recorder fed with the input of every tick
+        self.recorder = None
+        # optional profiler.FrameProfiler timing the update and draw phases
+        self.profiler = None
+        # optional controls.InputHandler, read by advance() instead of polling the keyboard
+        self.input_handler = None
 
-        # Lines
-        self.line_surface = self.surface.copy()
-        self.line_surface.fill((0,255,0))
-        self.line_surface.set_colorkey((0,255,0))
-        self.line_surface.set_alpha(120)
+        # keys held on the last tick, as a mask following controls.INPUT_KEYS
+        self.held = 0
 
-        # tetromino
-        self.field_data = [[0 for x in range(COLUMNS)] for y in range(ROWS)]
-        ## PIECE SORTER NEEDED
-        self.tetromino = Tetromino(choice(list(TETROMINOS.keys())),
-                                   self.sprites,
-                                   self.create_new_tetromino,
-                                   self.field_data)
+        # auto shift: the direction key being repeated and when it moves next
+        self.das = das
+        self.arr = arr
+        self.shift = 0
+        self.next_shift = 0
 
         # timer
-        self.down_speed = UPDATE_START_SPEED
-        self.down_speed_faster = self.down_speed * 0.3
-        self.down_pressed = False
+        self.clock = clock if clock else VirtualClock()
+        self.time_accumulator = 0
 
         self.timers = {
-            'vertical move': Timer(self.down_speed, True, self.move_down),
-            'horizontal move': Timer(MOVE_WAIT_TIME),
-            'rotation move': Timer(ROTATE_WAIT_TIME)
+            'vertical move': Timer(self.engine.down_speed, True, self.move_down, self.clock),
         }
         self.timers['vertical move'].activate()
 
-        #score
-        self.current_lvl = 1
-        self.current_score = 0
-        self.current_lines = 0
-
-    def calc_score(self, num_lines) -> None:
+    @property
+    def field_data(self) -> list:
         """
-        Updates score variables when lines are cleared
-
-        :param num_lines (int): number of lines to use for updates
+        Current board state, owned by the engine
         """
-        self.current_lines += num_lines
-        self.current_score += SCORE_DATA[num_lines] * self.current_lvl
+        return self.engine.field_data
 
-        if self.current_lines / 10 > self.current_lvl:
-            self.current_lvl += 1
-            self.down_speed *= 0.80
-            self.down_speed_faster = self.down_speed * 0.3
-            self.timers['vertical move'].duration = self.down_speed
+    def timer_update(self) -> None:
+        """
+        Global timer updates
+        """
+        for timer in self.timers.values():
+            timer.update()
 
-        self.update_score(self.current_lines, self.current_score, self.current_lvl)
+    def move_down(self) -> None:
+        """
+        Moves the active piece down or locks it
+        """
+        self.engine.move_down()
 
-    def create_new_tetromino(self) -> None:
+    def input(self, held: int, pressed: int) -> None:
         """
-        Creates new instance of tetromino and changes player control to it
+        Handles player input on arrow keys, space hard drops. Every press moves or rotates once,
+        holding left or right repeats the move after DAS every ARR milliseconds.
+
+        :param held: keys held at the end of the tick
+        :param pressed: keys that went down during the tick, even if already released
         """
+        now = self.clock()
 
-        self.check_finished_rows()
-        new_tetromino = Tetromino(self.get_next_shape(), self.sprites, self.create_new_tetromino, self.field_data)
+        for bit, direction in ((LEFT, -1), (RIGHT, 1)):
+            if pressed & bit:
+                self.engine.move_horizontal(direction)
+                self.shift = bit
+                self.next_shift = now + self.das
 
-        # Check for overlap at spawn
-        for block in new_tetromino.blocks:
-            x = int(block.pos.x)
-            y = int(block.pos.y)
-            if y >= 0 and self.field_data[y][x]:
-                self.tetromino = new_tetromino
-                return
+        # releasing the repeating key hands the repeat to the other direction if it is still held
+        if self.shift and not held & self.shift:
+            self.shift = held & (LEFT | RIGHT)
+            self.next_shift = now + self.das
 
-        self.tetromino = new_tetromino
+        if self.shift:
+            direction = -1 if self.shift == LEFT else 1
+            while now >= self.next_shift:
+                if not self.engine.move_horizontal(direction) or self.arr <= 0:
+                    # with an ARR of 0 the piece keeps sliding as soon as it has room
+                    while self.arr <= 0 and self.engine.move_horizontal(direction):
+                        pass
+                    break
+                self.next_shift += self.arr
 
-    def timer_update(self) -> None:
+        if pressed & ROTATE:
+            self.engine.rotate()
+
+        if pressed & HARD_DROP:
+            self.engine.hard_drop()
+
+        #down speedup, also picks up level speedups
+        if held & SOFT_DROP:
+            self.timers['vertical move'].duration = self.engine.down_speed_faster
+        else:
+            self.timers['vertical move'].duration = self.engine.down_speed
+        self.held = held
+
+    def update(self, keys=None, taps: int = 0) -> None:
         """
-        Global timer updates
+        Advances the game logic by one fixed timestep
+
+        :param keys: held keys for this tick, either a mask following controls.INPUT_KEYS or a key state
+                     indexed by pygame key constants, polled from pygame if omitted
+        :param taps: mask of keys pressed during the tick that may already be released again
         """
-        for timer in self.timers.values():
-            timer.update()
+        if keys is None:
+            keys = pygame.key.get_pressed()
+        held = keys if isinstance(keys, int) else encode_keys(keys)
+        pressed = taps | held & ~self.held
+        if self.recorder:
+            self.recorder.record(held, pressed)
 
-    def move_down(self) -> None:
+        self.clock.tick(TICK_DURATION)
+        self.input(held, pressed)
+        if self.profiler:
+            self.profiler.mark('input')
+        self.timer_update()
+        if self.profiler:
+            self.profiler.mark('timers')
+
+    def advance(self, dt: float, keys=None) -> int:
+        """
+        Runs as many fixed timesteps as fit in dt, carrying the remainder to the next call.
+        Only ticks a VirtualClock, so the game can be driven at 1x from the frame time or
+        at any speed headlessly with identical results.
+
+        With an input handler attached, each tick gets the key events that happened during
+        the stretch of real time it stands for, and the last tick also gets every event read
+        before the call, so a press shows in the frame it was read in.
+
+        :param dt: elapsed time in milliseconds
+        :param keys: key state used for every tick, read from the input handler or polled from pygame if omitted
+        :return: number of ticks run
+        """
+        self.time_accumulator += min(dt, MAX_FRAME_TIME)
+        handler = self.input_handler if keys is None else None
+        now = handler.now() if handler else 0
+        ticks = 0
+        while self.time_accumulator >= TICK_DURATION:
+            self.time_accumulator -= TICK_DURATION
+            if handler:
+                last = self.time_accumulator < TICK_DURATION
+                self.update(*handler.tick(now if last else now - self.time_accumulator))
+            else:
+                self.update(keys)
+            ticks += 1
+        return ticks
+
+
+class Game(GameLogic):
+    def __init__(self, get_next_shape, events: EventBus = None, clock: callable = None,
+                 das: float = DAS, arr: float = ARR) -> None:
         """
-        Moves player tetromino down
+        Initializes class variables and board-state
+
+        :param events: bus the engine publishes game events on
+        :param clock: millisecond clock for the timers, defaults to a VirtualClock advanced by advance()
+        :param das: milliseconds a sideways key is held before it auto-repeats
+        :param arr: milliseconds between auto-repeated moves, 0 moves to the wall at once
         """
-        self.tetromino.move_down()
+        super().__init__(get_next_shape, events, clock, das, arr)
 
-    def draw_grid(self) -> None:
-        """Draws Game board"""
+        # General Settings
+        self.surface = pygame.Surface((GAME_WIDTH,GAME_HEIGHT))
+        self.display_surface = pygame.display.get_surface()
+        self.rect = self.surface.get_rect(topleft = (PADDING, PADDING))
+        self.sprites = pygame.sprite.Group()
 
-        for col in range(1, COLUMNS):
-            x = col * CELL_SIZE
-            pygame.draw.line(self.surface,"White", (x,0), (x,self.surface.get_height()), 1)
+        # Lines
+        self.line_surface = self.surface.copy()
+        self.line_surface.fill((0,255,0))
+        self.line_surface.set_colorkey((0,255,0))
+        self.draw_grid()
 
-        for row in range(1, ROWS):
-            y = row * CELL_SIZE
-            pygame.draw.line(self.surface, "White", (0,y), (self.surface.get_width(), y), 1)
+        # Locked blocks, baked into one surface instead of kept as sprites
+        self.board_surface = self.surface.copy()
+        self.board_surface.fill(Gray)
 
-        self.surface.blit(self.line_surface, (0,0))
+        # rendering state, the playfield is only fully recomposited after a line clear
+        self.full_redraw = True
+        self.drawn_pieces = 0
+        self.drawn_lines = 0
+        self.drawn_cells = ([], [])
+        self.tetromino = Tetromino(self.engine, self.sprites)
 
-    def input(self) -> None:
+    def create_new_tetromino(self) -> None:
         """
-        Handles player input on arrow keys
+        Replaces the sprites after the engine locked a piece and changes player control to the new one
         """
-        keys = pygame.key.get_pressed()
+        self.sprites.empty()
+        self.tetromino = Tetromino(self.engine, self.sprites)
 
-        if not self.timers['horizontal move'].active:
-
-            if keys[pygame.K_LEFT]:
-                self.tetromino.move_horizontal(-1)
-                self.timers['horizontal move'].activate()
+    def bake_cells(self, cells: list) -> None:
+        """
+        Draws locked cells into the board surface
+        :param cells: list of (x, y) tuples
+        """
+        for x, y in cells:
+            self.board_surface.blit(Block.tile(self.engine.board.get(x, y)), (x * CELL_SIZE, y * CELL_SIZE))
 
-            if keys[pygame.K_RIGHT]:
-                self.tetromino.move_horizontal(1)
-                self.timers['horizontal move'].activate()
+    def render_board(self) -> None:
+        """
+        Redraws every locked block into the board surface, needed after rows are cleared
+        """
+        self.board_surface.fill(Gray)
+        for y, row in enumerate(self.field_data):
+            for x, color in enumerate(row):
+                if color:
+                    self.board_surface.blit(Block.tile(color), (x * CELL_SIZE, y * CELL_SIZE))
 
-        if not self.timers['rotation move'].active:
-            if keys[pygame.K_UP]:
-                self.tetromino.rotate()
-                self.timers['rotation move'].activate()
+    def draw_grid(self) -> None:
+        """Pre-renders the Game board grid into the cached line layer"""
 
-        #down speedup
-        if not self.down_pressed and keys[pygame.K_DOWN]:
-            self.down_pressed = True
-            self.timers['vertical move'].duration = self.down_speed_faster
+        for col in range(1, COLUMNS):
+            x = col * CELL_SIZE
+            pygame.draw.line(self.line_surface,"White", (x,0), (x,self.line_surface.get_height()), 1)
 
-        if self.down_pressed and not keys[pygame.K_DOWN]:
-            self.down_pressed = False
-            self.timers['vertical move'].duration = self.down_speed
+        for row in range(1, ROWS):
+            y = row * CELL_SIZE
+            pygame.draw.line(self.line_surface, "White", (0,y), (self.line_surface.get_width(), y), 1)
 
-    def check_finished_rows(self) -> None:
+    def draw_ghost(self, cells: list) -> None:
         """
-        Handles deletion of completed rows and related board updates
+        Outlines the cells the active piece would land on
+        :param cells: list of (x, y) tuples
         """
+        for x, y in cells:
+            rect = (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+            pygame.draw.rect(self.surface, self.tetromino.color, rect, 2)
 
-        # get full row indexs
-        delete_rows = []
-        for i, row in enumerate(self.field_data):
-            if all(row):
-                delete_rows.append(i)
-
-        if delete_rows:
-            for delete_row in delete_rows:
+    def draw(self) -> list:
+        """
+        Composites the playfield, redrawing only the cells the active piece left or entered
+        and any newly locked cells, unless rows were cleared since the last frame
 
-                # delete full row
-                for block in self.field_data[delete_row]:
-                    block.kill()
+        :return: list of display rects that changed
+        """
+        locked_cells = []
+        if self.drawn_pieces != self.engine.pieces:
+            if self.engine.pieces - self.drawn_pieces == 1 and self.drawn_lines == self.engine.current_lines:
+                locked_cells = self.engine.locked_cells
+                self.bake_cells(locked_cells)
+            else:
+                self.render_board()
+                self.full_redraw = True
+            self.drawn_pieces = self.engine.pieces
+            self.drawn_lines = self.engine.current_lines
+            self.create_new_tetromino()
+        self.tetromino.update()
+        self.sprites.update()
+        if self.profiler:
+            self.profiler.mark('sprites')
+
+        # ghost piece at the landing position
+        piece_cells = self.tetromino.piece.cells
+        distance = 0 if self.engine.game_over else self.engine.drop_distance()
+        ghost_cells = [(x, y + distance) for x, y in piece_cells if y + distance >= 0] if distance else []
+
+        cells = ([(x, y) for x, y in piece_cells if y >= 0], ghost_cells)
+        if self.full_redraw:
+            self.full_redraw = False
+            self.surface.blit(self.board_surface, (0,0))
+            self.draw_ghost(ghost_cells)
+            self.sprites.draw(self.surface)
+            self.surface.blit(self.line_surface, (0,0))
+            self.display_surface.blit(self.surface, self.rect)
+            dirty = [self.rect]
+
+        elif cells != self.drawn_cells or locked_cells:
+            rects = [pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+                     for x, y in set(locked_cells).union(*self.drawn_cells, *cells)]
+            for rect in rects:
+                self.surface.blit(self.board_surface, rect, rect)
+            self.draw_ghost(ghost_cells)
+            for block in self.tetromino.blocks:
+                self.surface.blit(block.image, block.rect)
+
+            dirty = []
+            for rect in rects:
+                self.surface.blit(self.line_surface, rect, rect)
+                dirty.append(self.display_surface.blit(self.surface, rect.move(PADDING, PADDING), rect))
 
-                # move down blocks
-                for row in self.field_data:
-                    for block in row:
-                        if block and block.pos.y < delete_row:
-                            block.pos.y += 1
-            #rebuild field_data
-            self.field_data = [[0 for x in range(COLUMNS)] for y in range(ROWS)]
-            for block in self.sprites:
-                self.field_data[int(block.pos.y)][int(block.pos.x)] = block
+        else:
+            dirty = []
 
-            self.calc_score(len(delete_rows))
+        self.drawn_cells = cells
+        if dirty:
+            pygame.draw.rect(self.display_surface, 'White', self.rect, 2, 2)
+        if self.profiler:
+            self.profiler.mark('draw')
+        return dirty
 
-    def run(self) -> None:
+    def run(self, dt: float = TICK_DURATION) -> list:
         """
         Runs Game mainloop
+
+        :param dt: milliseconds since the last frame
+        :return: list of display rects that changed
         """
 
         # update
-        self.input()
-        self.timer_update()
-        self.sprites.update()
+        self.advance(dt)
         # Drawing
-        self.surface.fill(Gray)
-        self.sprites.draw(self.surface)
-
-        self.draw_grid()
-        self.display_surface.blit(self.surface, (PADDING,PADDING))
-        pygame.draw.rect(self.display_surface, 'White', self.rect, 2, 2)
+        return self.draw()
 
 class Tetromino:
-    def __init__(self, shape: str, group: any, create_new_tetromino: callable, field_data: list) -> None:
+    def __init__(self, engine: Engine, group: any) -> None:
         """
-        Initializes a new tetromino
+        Initializes the sprites for the engine's active piece
 
-        :param shape: The shape of the tetromino
+        :param engine: Headless engine that owns the piece and the board
         :param group: Container for the individual blocks
-        :param create_new_tetromino: Callback function to create a new tetromino
-        :param field_data: Current board state for checking collision
         """
         # Setup
-        self.shape = shape
-        self.block_positions = TETROMINOS[shape]['shape']
-        self.color = TETROMINOS[shape]['color']
-        self.create_new_tetromino = create_new_tetromino
-        self.field_data = field_data
+        self.engine = engine
+        self.piece = engine.piece
+        self.shape = self.piece.shape
+        self.color = self.piece.color
 
         # create blocks
-        self.blocks = [Block(group, pos, self.color) for pos in self.block_positions]
-
-    # Collisions
-    def next_move_horizontal_collide(self, blocks: list, amount: int) -> bool:
-        """
-        Collects the location of each block in active tetromino for checking horizontal collision
-        :param blocks: list of tuples containing coordinates of each block
-        :param amount: direction of movement
-        :return: returns True if collision occurs otherwise returns true
-        """
-        collision_list = [block.horizontal_collide(int(block.pos.x) + amount, self.field_data) for block in self.blocks]
-        return True if any(collision_list) else False
+        self.blocks = [Block(group, pos, self.color) for pos in self.piece.cells]
 
-    def next_move_vertical_collide(self, blocks, amount) -> bool:
-        """
-        Collects the location of each block in active tetromino for checking vertical collision
-        :param blocks: list of tuples containing coordinates of each block
-        :param amount: direction of movement
-        :return: returns True if collision occurs otherwise returns true
-        """
-        collision_list = [block.vertical_collide(int(block.pos.y) + amount, self.field_data) for block in self.blocks]
-        return True if any(collision_list) else False
-
-    # Movement
-    def move_horizontal(self, amount) -> None:
+    def update(self) -> None:
         """
-        Moves the active tetromino left or right
-        :param amount: direction of move
+        Moves the blocks to the piece's current cells
         """
-        if not self.next_move_horizontal_collide(self.blocks, amount):
-            for block in self.blocks:
-                block.pos.x += amount
+        for block, (x, y) in zip(self.blocks, self.piece.cells):
+            block.pos.update(x, y)
 
-    def move_down(self) -> None:
-        """
-        Moves the active tetromino down or makes a new one if unable to
-        """
-        if not self.next_move_vertical_collide(self.blocks, 1):
-            for block in self.blocks:
-                block.pos.y += 1
-        else:
-            for block in self.blocks:
-                self.field_data[int(block.pos.y)][int(block.pos.x)] = block
-            self.create_new_tetromino()
+class Block(pygame.sprite.Sprite):
+    # one shared tile surface per color
+    tiles = {}
 
-    def rotate(self) -> None:
+    @classmethod
+    def tile(cls, color: str) -> pygame.Surface:
         """
-        Spins the active tetromino in place 90 degrees clockwise, excepting "O" blocks
+        Returns the cached tile for a color, creating it on first use
+        :param color: string containing the color id from the settings file
         """
-        if self.shape != 'O':
-            pivot_pos = self.blocks[0].pos
-            new_block_positions = [block.rotate(pivot_pos) for block in self.blocks]
-
-            # collision
-            for pos in new_block_positions:
-                # horizontal
-                if pos.x < 0 or pos.x >= COLUMNS:
-                    return
-                # field
-                if self.field_data[int(pos.y)][int(pos.x)]:
-                    return
-                # vert/floor check
-                if pos.y > ROWS:
-                    return
-
-            for i, block in enumerate(self.blocks):
-                block.pos = new_block_positions[i]
+        if color not in cls.tiles:
+            surface = pygame.Surface((CELL_SIZE,CELL_SIZE))
+            surface.fill(color)
+            cls.tiles[color] = surface
+        return cls.tiles[color]
 
-class Block(pygame.sprite.Sprite):
     def __init__(self, group: any, pos: tuple, color: str) -> None:
         """
         Initializes a new block
         :param group: Group location for the block
-        :param pos: tuple containing the coords for the block
+        :param pos: tuple containing the board coords for the block
         :param color: string containing the color id from the settings file
         """
 
         # General
         super().__init__(group)
-        self.image = pygame.Surface((CELL_SIZE,CELL_SIZE))
-        self.image.fill(color)
+        self.image = self.tile(color)
 
         # position
-        self.pos = pygame.Vector2(pos) + BLOCK_OFFSET
+        self.pos = pygame.Vector2(pos)
         self.rect = self.image.get_rect(topleft = self.pos * CELL_SIZE)
 
-    def rotate(self, pivot_pos: tuple) -> tuple:
-        """
-        Takes the location of a block and moves it to the new position after applying a rotation
-        :param pivot_pos: tuple of the current location
-        :return: tuple of the rotated position
-        """
-        return pivot_pos + (self.pos - pivot_pos).rotate(90)
-
-    def horizontal_collide(self, x, field_data) -> bool:
-        """
-        returns True if the block would collide with the board edge or the side of another block
-        :param x: x coord on the game board
-        :param field_data: current boardstate of the whole field
-        :return: True if collision occurs, otherwise returns nothing
-        """
-        if not 0 <= x < COLUMNS:
-            return True
-
-        if field_data[int(self.pos.y)][x]:
-            return True
-
-    def vertical_collide(self, y, field_data) -> bool:
-        """
-        returns True if block would collide with the bottom of the board or the top of another block
-        :param y: y-coord of the block
-        :param field_data: current boardstate
-        :return: True if collision occurs, otherwise returns nothing
-        """
-        if not y < ROWS:
-            return True
-
-        if y >= 0 and field_data[y][int(self.pos.x)]:
-            return True
-
     def update(self) -> None:
         """Changes current cell sprite position to new one """
-        self.rect.topleft =self.pos * CELL_SIZE
\ No newline at end of file
+        self.rect.topleft =self.pos * CELL_SIZE
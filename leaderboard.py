@@ -0,0 +1,77 @@
+from settings import *
+from bisect import insort
+
+from scorestore import ScoreStore
+
+
+class Leaderboard:
+    def __init__(self, store: ScoreStore, size: int = LEADERBOARD_SIZE) -> None:
+        """
+        Loads the best results from the score store once and keeps them in memory
+
+        :param store: shared score storage
+        :param size: number of top results kept in the sorted index
+        """
+        self.store = store
+        self.size = size
+
+        # sorted best-first by (-score, row id), entries are (name, score, level, lines)
+        self.top_scores = []
+        self.player_best = {}
+        self.last_id = 0
+
+        self.load()
+
+    def load(self) -> None:
+        """
+        Reads the top results and every player's best from the store
+        """
+        top, bests, self.last_id = self.store.load(self.size)
+        self.top_scores = [(-score, row_id, (name, score, level, lines))
+                           for row_id, name, score, level, lines in top]
+        self.player_best = {name: (name, score, level, lines)
+                            for row_id, name, score, level, lines in bests}
+
+    def refresh(self) -> None:
+        """
+        Merges results other instances stored since the last load or refresh
+        """
+        for row_id, name, score, level, lines in self.store.since(self.last_id):
+            self.insert(row_id, (name, score, level, lines))
+            self.last_id = row_id
+
+    def insert(self, row_id: int, entry: tuple) -> None:
+        """
+        Adds a result to the in-memory index
+        :param row_id: id of the result in the store
+        :param entry: (name, score, level, lines)
+        """
+        insort(self.top_scores, (-entry[1], row_id, entry))
+        del self.top_scores[self.size:]
+
+        best = self.player_best.get(entry[0])
+        if best is None or entry[1] > best[1]:
+            self.player_best[entry[0]] = entry
+
+    def add(self, score_data: tuple) -> None:
+        """
+        Stores a result and brings the index up to date
+        :param score_data: (name, score, level, lines)
+        """
+        self.store.add(score_data)
+        self.refresh()
+
+    def top(self, n: int = 5) -> list:
+        """
+        Best results, highest score first
+        :param n: number of results, at most the index size
+        :return: list of (name, score, level, lines)
+        """
+        return [entry for score, row_id, entry in self.top_scores[:n]]
+
+    def best(self, name: str) -> tuple:
+        """
+        Best result of a single player
+        :return: (name, score, level, lines), or None if the player has no results
+        """
+        return self.player_best.get(name)
@@ -1,19 +1,52 @@
+from time import perf_counter, process_time
+STARTED = perf_counter()
+
 from settings import *
 from sys import exit
-from random import choice, shuffle
+from random import SystemRandom
 import os
-import csv
 
 #components
 from game import Game
+from client import RemoteGame
 from score import Score
 from preview_pieces import Preview
+from randomizer import Randomizer
+from replay import Recorder, replay_path
+import snapshot
+from textcache import text_cache
+from leaderboard import Leaderboard
+from scorestore import ScoreStore
+from profiler import FrameProfiler
+from assets import assets
+from controls import InputHandler
+from events import EventBus, GameOver
+import argparse
+
+# seconds spent importing the modules above
+IMPORT_TIME = perf_counter() - STARTED
 
 class Main:
-    def __init__(self) -> None:
+    def __init__(self, scoreboard_db: str = SCOREBOARD_DB, profile: bool = False, profile_path: str = None,
+                 server: tuple = None, startup_report: bool = False, das: float = DAS, arr: float = ARR,
+                 cpu_report: bool = False) -> None:
         """
         Initializes the main gameloop including core components.
+
+        :param scoreboard_db (str): path of the shared scoreboard database
+        :param profile (bool): time the phases of every frame, F3 toggles the overlay during play
+        :param profile_path (str, optional): file the recorded frame times are written to on exit
+        :param server (tuple, optional): (host, port) of a game server to play on instead of locally
+        :param startup_report (bool): print how long imports, assets and the first frame took
+        :param das (float): milliseconds a sideways key is held before it auto-repeats
+        :param arr (float): milliseconds between auto-repeated moves, 0 moves to the wall at once
+        :param cpu_report (bool): print the CPU use of gameplay and of the idle screens on exit
         """
+        self.server = server
+        self.startup_report = startup_report
+        self.das = das
+        self.arr = arr
+        self.cpu_report = cpu_report
 
         # General
         pygame.init()
@@ -25,95 +58,211 @@ class Main:
         self.state = 'menu'
         self.player_name = ''
         self.name_input_active = False
+        self.drawn_cursor = True
+
+        # CPU and wall time spent in gameplay and on the idle screens
+        self.cpu_time = {'idle': 0.0, 'active': 0.0}
+        self.wall_time = {'idle': 0.0, 'active': 0.0}
 
         # Font
-        self.font= pygame.font.Font(os.path.join('graphics', 'Russo_One.ttf'),40)
+        self.font = assets.font(40)
+        self.score_font = assets.font(20)
 
-        # Piecebag
-        self.next_shapes = []
-        self.piecebag = []
-        self.piecebag = list(TETROMINOS.keys())
-        shuffle(self.piecebag)
+        # Profiling
+        self.profiler = FrameProfiler(path=profile_path) if profile or profile_path else None
 
+        # Input, key events are timestamped as they are read and handed to the game ticks
+        self.input_handler = InputHandler()
 
         # Components
+        store = ScoreStore(scoreboard_db)
+        store.import_csv(SCOREBOARD_FILE)
+        self.leaderboard = Leaderboard(store)
         self.score = Score()
         self.preview = Preview()
+        self.pause_overlay = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
+        self.pause_overlay.fill((0, 0, 0, 150))
+
+        # every game publishes on the same bus, so the panels subscribe once
+        self.events = EventBus()
+        self.score.subscribe(self.events)
+        self.preview.subscribe(self.events, lambda: self.next_shapes)
+        self.events.subscribe(GameOver, self.game_over)
+        self.game = None
         self.init_game()
 
     def init_game(self) -> None:
         """
-        Initializes the Game class instance as well as setting up the piecbag
-        refreshing it if a game has already been played.
-        """
-        self.piecebag = []
-        self.next_shapes = []
-
-        self.refill_piecebag()
-        self.refill_next_shapes()
-        self.game = Game(self.get_next_shape, self.update_score)
-
-    def update_score(self, lines, score, lvl) -> None:
-        """
-        Updates the lines, score and level variables of the game.
-
-        :param lines (int): Number of lines cleared
-        :param score (int): Point total from clearing lines
-        :param lvl (int): relative speed based on cleared lines
-        """
-        self.score.lines = lines
-        self.score.score = score
-        self.score.lvl = lvl
-
-    def refill_piecebag(self) -> None:
-        """
-        Refill the piecebag with a shuffled set of all tetromino types.
+        Initializes the Game class instance as well as setting up a freshly seeded randomizer
+        and a recorder for the game's inputs. When playing on a server, the game only mirrors
+        the server's state, while the server keeps the randomizer and saves the replay.
         """
-        self.piecebag = list(TETROMINOS.keys())
-        shuffle(self.piecebag)
-
-    def refill_next_shapes(self) -> None:
+        if self.server:
+            if isinstance(self.game, RemoteGame):
+                self.game.close()
+            self.randomizer = None
+            self.game = RemoteGame(*self.server, self.player_name, self.events)
+            self.game.profiler = self.profiler
+            self.game.input_handler = self.input_handler
+            self.input_handler.reset()
+            self.reset_panels()
+            return
+
+        self.seed = SystemRandom().getrandbits(32)
+        self.randomizer = Randomizer(self.seed)
+        self.game = Game(self.randomizer.get_next_shape, self.events, das=self.das, arr=self.arr)
+        self.game.recorder = Recorder(self.seed)
+        self.game.profiler = self.profiler
+        self.game.input_handler = self.input_handler
+        self.input_handler.reset()
+        self.reset_panels()
+
+    def reset_panels(self) -> None:
         """
-        Ensure there are always 3 shapes in the preview queue.
+        Shows the new game's starting score and preview queue.
         """
-        while len(self.next_shapes) < 3:
-            if not self.piecebag:
-                self.refill_piecebag()
-            self.next_shapes.append(self.piecebag.pop())
+        self.score.reset()
+        self.preview.next_shapes = list(self.next_shapes)
 
-    def get_next_shape(self) -> str:
+    @property
+    def next_shapes(self) -> list:
         """
-        Pop the next shape and refill preview queue.
+        Shapes in the preview queue.
         """
-        if not self.next_shapes:
-            self.refill_next_shapes()
-        shape = self.next_shapes.pop(0)
-        self.refill_next_shapes()
-        return shape
+        if self.randomizer is None:
+            return self.game.next_shapes
+        return self.randomizer.next_shapes
 
     def run(self) -> None:
         """
-        Controls screen selection and gamestate.
+        Controls screen selection and gamestate. Gameplay runs at a fixed frame rate, every other
+        screen blocks until an event arrives or the name cursor blinks and only redraws then.
         """
         self.running = True
+        self.dt = 0
+        drawn_state = None
+        redraw = False
+        self.last_cpu, self.last_wall = process_time(), perf_counter()
         while self.running:
-            self.display_surface.fill('Gray')
+            state = self.state
+            if state == 'game':
+                events = pygame.event.get()
+            elif redraw or state != drawn_state:
+                events = pygame.event.get()
+            else:
+                events = self.wait_for_events()
+                # only the name screen has a blinking cursor to wake up for
+                if not events and (state != 'enter_name' or self.cursor_visible() == self.drawn_cursor):
+                    self.account(False)
+                    continue
+            # screens draw before they handle their events, so a handled event needs one more frame
+            redraw = bool(events)
+
+            # gameplay only pushes changed rects once the screen has been drawn in full
+            if self.profiler:
+                self.profiler.begin_frame()
+            full_redraw = state != 'game' or state != drawn_state
+            if full_redraw:
+                self.display_surface.fill('Gray')
+                self.game.full_redraw = True
+                self.score.drawn_values = None
+                self.preview.drawn_shapes = None
+            self.dirty_rects = []
 
             if self.state == 'menu':
-                self.run_menu()
+                self.run_menu(events)
             elif self.state == 'enter_name':
-                self.run_enter_name()
+                self.run_enter_name(events)
             elif self.state == 'game':
-                self.run_game()
+                self.run_game(events)
+            elif self.state == 'paused':
+                self.run_paused(events)
             elif self.state == 'game_over':
-                self.run_game_over()
+                self.run_game_over(events)
             elif self.state == 'high_scores':
-                self.run_high_scores()
+                self.run_high_scores(events)
+
+            if self.profiler and self.profiler.overlay and state == 'game':
+                self.dirty_rects.append(self.profiler.draw(self.display_surface))
+
+            if full_redraw:
+                pygame.display.update()
+            else:
+                pygame.display.update(self.dirty_rects)
+            if state == 'game':
+                self.input_handler.presented()
+            if self.profiler:
+                self.profiler.mark('display')
+                self.profiler.end_frame()
+            drawn_state = state
+            if self.startup_report:
+                self.report_startup()
+
+            # idle frames do not count towards the game's time, so leaving a screen never catches up ticks
+            if state == 'game':
+                self.dt = self.clock.tick(60)
+            else:
+                self.clock.tick()
+                self.dt = 0
+            self.account(state == 'game')
+
+        if self.profiler:
+            self.profiler.dump()
+            stats = self.input_handler.latency_stats()
+            if stats['count']:
+                print(f"input to frame latency over {stats['count']} presses: p50 {stats['p50']:.1f} ms, "
+                      f"p95 {stats['p95']:.1f} ms, max {stats['max']:.1f} ms")
+        if self.cpu_report:
+            self.report_cpu()
+
+    def wait_for_events(self) -> list:
+        """
+        Sleeps until an event arrives, waking up in time for the next cursor blink on the name screen
+        :return: the events, empty if the wait timed out
+        """
+        if self.state == 'enter_name':
+            timeout = CURSOR_BLINK - pygame.time.get_ticks() % CURSOR_BLINK + 1
+        else:
+            timeout = IDLE_WAKE
+        event = pygame.event.wait(timeout)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def cursor_visible(self) -> bool:
+        """
+        Phase of the blinking name cursor
+        """
+        return pygame.time.get_ticks() // CURSOR_BLINK % 2 == 0
+
+    def account(self, active: bool) -> None:
+        """
+        Adds the CPU and wall time since the last call to the active or idle totals
+        """
+        cpu, wall = process_time(), perf_counter()
+        mode = 'active' if active else 'idle'
+        self.cpu_time[mode] += cpu - self.last_cpu
+        self.wall_time[mode] += wall - self.last_wall
+        self.last_cpu, self.last_wall = cpu, wall
+
+    def report_cpu(self) -> None:
+        """
+        Prints the CPU use of gameplay and of the idle screens
+        """
+        for mode in ('idle', 'active'):
+            wall = self.wall_time[mode]
+            if wall:
+                print(f'cpu {mode}: {self.cpu_time[mode] / wall * 100:.1f}% over {wall:.1f} s')
 
-            pygame.display.update()
-            self.clock.tick(60)
+    def report_startup(self) -> None:
+        """
+        Prints the startup timings once the first frame is on screen
+        """
+        self.startup_report = False
+        print(f'startup: imports {IMPORT_TIME * 1000:.1f} ms, assets {assets.load_time * 1000:.1f} ms, '
+              f'first frame {(perf_counter() - STARTED) * 1000:.1f} ms')
 
-    def run_menu(self) -> None:
+    def run_menu(self, events: list) -> None:
         """
         Main menuloop.
         """
@@ -121,7 +270,7 @@ class Main:
         self.draw_text("Press ENTER to Start", y=200)
         self.draw_text("Press H for High Scores", y=260)
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             if event.type == pygame.KEYDOWN:
@@ -130,16 +279,18 @@ class Main:
                     self.state = 'enter_name'
                     self.player_name = ''
                 elif event.key == pygame.K_h:
+                    self.leaderboard.refresh()
                     self.state = 'high_scores'
 
-    def run_enter_name(self) -> None:
+    def run_enter_name(self, events: list) -> None:
         """
         mainloop for starting a game; takes in player name.
         """
+        self.drawn_cursor = self.cursor_visible()
         self.draw_text('Enter Your Name:', y=100)
-        self.draw_text(self.player_name + "|", y=160)
+        self.draw_text(self.player_name + ("|" if self.drawn_cursor else " "), y=160)
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             elif event.type == pygame.KEYDOWN:
@@ -152,71 +303,98 @@ class Main:
                     if len(self.player_name) < 12 and event.unicode.isprintable():
                         self.player_name += event.unicode
 
-    def run_game(self) -> None:
+    def run_game(self, events: list) -> None:
         """
         mainloop for running game.
         """
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
-
-
-        self.game.run()
+            self.input_handler.handle(event)
+            if (event.type == pygame.KEYDOWN and event.key in (pygame.K_p, pygame.K_ESCAPE)
+                    or event.type == pygame.WINDOWFOCUSLOST):
+                self.input_handler.reset()
+                if self.server:
+                    # the server keeps ticking a remote game, so only release the keys held there
+                    self.game.release_keys()
+                    continue
+                self.state = 'paused'
+                return
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and self.profiler:
+                self.profiler.overlay = not self.profiler.overlay
+                self.game.full_redraw = True
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_F5, pygame.K_F9) and self.randomizer:
+                if event.key == pygame.K_F5:
+                    self.save_checkpoint()
+                else:
+                    self.load_checkpoint()
+        if self.profiler:
+            self.profiler.mark('events')
+
+        self.dirty_rects += self.game.run(self.dt)
+        for rect in (self.score.run(), self.preview.run()):
+            if rect:
+                self.dirty_rects.append(rect)
+        if self.profiler:
+            self.profiler.mark('panels')
+
+    def run_paused(self, events: list) -> None:
+        """
+        Shows the frozen game under a pause message, the game does not advance.
+        """
+        self.game.draw()
         self.score.run()
-        self.preview.run(self.next_shapes)
+        self.preview.run()
+        self.display_surface.blit(self.pause_overlay, self.game.rect)
+        self.draw_text('Paused', x=self.game.rect.centerx, y=self.game.rect.centery - 30)
+        self.draw_text('P to resume', x=self.game.rect.centerx, y=self.game.rect.centery + 30, font=self.score_font)
 
-        if self.game_over():
-            self.save_score([self.player_name, self.score.score, self.score.lvl, self.score.lines])
-            self.state = 'game_over'
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.running = False
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_p, pygame.K_ESCAPE):
+                self.state = 'game'
 
-    def run_game_over(self) -> None:
+    def run_game_over(self, events: list) -> None:
         """
         Mainloop for game over state.
         """
         self.draw_text('Game Over', y=150)
         self.draw_text("Press M for Menu", y=220)
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_m:
                     self.state = 'menu'
 
-    def run_high_scores(self) -> None:
+    def run_high_scores(self, events: list) -> None:
         """
         Mainloop for scoreboard
         """
         self.draw_text("High Scores", y=50)
         self.draw_text('M for menu', y=WINDOW_HEIGHT - 60)
 
-        try:
-            with open('scoreboard.csv', 'r', newline='') as file:
-                reader = list(csv.reader(file))
-
-                valid_rows = [row for row in reader if len(row) == 4 and row[1].isdigit()]
+        top_scores = self.leaderboard.top(5)
+        for i, row in enumerate(top_scores):
+            y = 120 + i * 50
 
-                valid_rows.sort(key=lambda x: int(x[1]), reverse=True)
+            # Background rectangle
+            rect_width = 500
+            rect_height = 40
+            rect_x = (WINDOW_WIDTH - rect_width) // 2
+            rect = pygame.Rect(rect_x, y - 20, rect_width, rect_height)
+            pygame.draw.rect(self.display_surface, '#333333', rect, border_radius=6)
+            pygame.draw.rect(self.display_surface, 'White', rect, 2, border_radius=6)
 
-                for i, row in enumerate(valid_rows[:5]):
-                    y = 120 + i * 50
+            # Score text
+            score_text = f"{i + 1}. {row[0]} | Score: {row[1]} | Level: {row[2]} | Lines: {row[3]}"
+            self.draw_text(score_text, font=self.score_font, y=y)
 
-                    # Background rectangle
-                    rect_width = 500
-                    rect_height = 40
-                    rect_x = (WINDOW_WIDTH - rect_width) // 2
-                    rect = pygame.Rect(rect_x, y - 20, rect_width, rect_height)
-                    pygame.draw.rect(self.display_surface, '#333333', rect, border_radius=6)
-                    pygame.draw.rect(self.display_surface, 'White', rect, 2, border_radius=6)
-
-                    # Score text
-                    score_text = f"{i + 1}. {row[0]} | Score: {row[1]} | Level: {row[2]} | Lines: {row[3]}"
-                    font = pygame.font.Font(os.path.join('graphics', 'Russo_One.ttf'),20)
-                    self.draw_text(score_text, font=font, y=y)
-
-        except FileNotFoundError:
+        if not top_scores:
             self.draw_text("No scores yet.", y=120)
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
             if event.type == pygame.KEYDOWN:
@@ -235,34 +413,79 @@ class Main:
         if font is None:  # If no custom font is provided, use the default font
             font = self.font
 
-        text_surf = font.render(text, True, 'White')
+        text_surf = text_cache.render(font, text)
         rect = text_surf.get_rect(center=(WINDOW_WIDTH // 2 if x is None else x, y))
         self.display_surface.blit(text_surf, rect)
 
     def save_score(self, score_data: tuple) -> None:
         """
-        Sends post game data to scoreboard CSV
+        Sends post game data to the leaderboard, which stores it in the shared scoreboard database
+        """
+        self.leaderboard.add(score_data)
+
+    def save_replay(self) -> None:
+        """
+        Saves the finished game's seed and inputs to the replays folder
         """
-        file_exists = os.path.exists('scoreboard.csv')
-        write_header = not file_exists or os.path.getsize('scoreboard.csv') == 0
-        with open('scoreboard.csv', 'a') as file:
-            writer = csv.writer(file)
-            if write_header:
-                writer.writerow(['NAME', 'SCORE', 'LEVEL', 'LINES'])
-            writer.writerow(score_data)
+        if self.game.recorder is None:
+            return
+        os.makedirs(REPLAY_FOLDER, exist_ok=True)
+        self.game.recorder.save(replay_path(REPLAY_FOLDER, self.seed, self.player_name), self.game.engine)
 
-    def game_over(self) -> bool:
+    def save_checkpoint(self) -> None:
+        """
+        Writes a snapshot of the running game to the checkpoint file
+        """
+        with open(CHECKPOINT_FILE, 'wb') as file:
+            file.write(snapshot.capture(self.game, self.randomizer))
+
+    def load_checkpoint(self) -> None:
+        """
+        Resumes the game saved in the checkpoint file. The recording no longer starts
+        from the game's seed, so no replay is saved for the resumed game.
+        """
+        if not os.path.exists(CHECKPOINT_FILE):
+            return
+        with open(CHECKPOINT_FILE, 'rb') as file:
+            data = file.read()
+        try:
+            snapshot.restore(self.game, self.randomizer, data)
+        except ValueError:
+            # corrupt, or left by an older version or another randomizer, restore() changed nothing
+            os.remove(CHECKPOINT_FILE)
+            return
+        self.game.recorder = None
+
+        engine = self.game.engine
+        self.score.score, self.score.lvl, self.score.lines = engine.current_score, engine.current_lvl, engine.current_lines
+        self.preview.next_shapes = list(self.next_shapes)
+
+    def game_over(self, event: GameOver) -> None:
         """
-        Checks for Game over condition
+        Saves the finished game's score and replay and shows the game over screen
         """
-        for block in self.game.tetromino.blocks:
-            x = int(block.pos.x)
-            y = int(block.pos.y)
-            if y >= 0 and self.game.field_data[y][x]:
-                return True
-        return False
+        if self.state != 'game':
+            return
+        self.save_score([self.player_name, event.score, event.lvl, event.lines])
+        self.save_replay()
+        self.state = 'game_over'
 
 
 if __name__ == "__main__":
-    main = Main()
+    parser = argparse.ArgumentParser(description='Tetris')
+    parser.add_argument('--profile', action='store_true', help='time every frame, F3 shows the overlay')
+    parser.add_argument('--profile-out', help='write the recorded frame times to this file on exit')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='play on a game server instead of locally')
+    parser.add_argument('--startup-report', action='store_true', help='print how long startup took')
+    parser.add_argument('--das', type=float, default=DAS, help='milliseconds before a held sideways key repeats')
+    parser.add_argument('--arr', type=float, default=ARR, help='milliseconds between repeats, 0 slides to the wall')
+    parser.add_argument('--cpu-report', action='store_true', help='print the CPU use of gameplay and idle screens on exit')
+    args = parser.parse_args()
+
+    server = None
+    if args.connect:
+        host, _, port = args.connect.partition(':')
+        server = (host or SERVER_HOST, int(port) if port else SERVER_PORT)
+    main = Main(profile=args.profile, profile_path=args.profile_out, server=server, startup_report=args.startup_report,
+                das=args.das, arr=args.arr, cpu_report=args.cpu_report)
     main.run()
\ No newline at end of file
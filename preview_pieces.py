@@ -1,7 +1,7 @@
 import pygame.display
 from settings import *
-from pygame.image import load
-from os import path
+from assets import assets
+from events import EventBus, PieceSpawned
 
 class Preview:
     def __init__(self) -> None:
@@ -13,11 +13,24 @@ class Preview:
         self.display_surface = pygame.display.get_surface()
         self.rect = self.surface.get_rect(topright = (WINDOW_WIDTH - PADDING, PADDING))
 
-        # shapes
-        self.shape_surfaces = {shape: load(path.join('graphics',f'{shape}.png')).convert_alpha() for shape in TETROMINOS.keys()}
-
         #image pos data
-        self.increment_height = self.surface.get_height() / 3
+        self.increment_height = self.surface.get_height() / PREVIEW_SHAPES
+        self.drawn_shapes = None
+
+        # shapes to show, refreshed whenever a piece spawns
+        self.next_shapes = []
+        self.source = None
+
+    def subscribe(self, events: EventBus, source: callable) -> None:
+        """
+        Refreshes the preview whenever a game publishing on the bus spawns a piece
+        :param source: returns the current preview queue
+        """
+        self.source = source
+        events.subscribe(PieceSpawned, self.piece_spawned)
+
+    def piece_spawned(self, event: PieceSpawned) -> None:
+        self.next_shapes = list(self.source())
 
     def display_pieces(self, shapes: list) -> None:
         """
@@ -25,18 +38,23 @@ class Preview:
         :param shapes: list of next pieces by letter name
         """
         for i, shape in enumerate(shapes):
-            shape_surface = self.shape_surfaces[shape]
+            shape_surface = assets.shape_image(shape)
             x = self.surface.get_width() / 2
             y = self.increment_height / 2 + (i * self.increment_height)
             rect = shape_surface.get_rect(center= (x,y))
             self.surface.blit(shape_surface, rect)
 
-    def run(self, next_shapes: list) -> None:
+    def run(self) -> pygame.Rect:
         """
         Updates and displays next pieces on display
-        :param next_shapes: list of next pieces by letter name
+        :return: the panel rect if it was redrawn, otherwise None
         """
+        if self.drawn_shapes == self.next_shapes:
+            return None
+        self.drawn_shapes = self.next_shapes
+
         self.surface.fill('Gray')
-        self.display_pieces(next_shapes)
+        self.display_pieces(self.next_shapes)
         self.display_surface.blit(self.surface, self.rect)
-        pygame.draw.rect(self.display_surface, 'White' ,self.rect, 2, 2)
\ No newline at end of file
+        pygame.draw.rect(self.display_surface, 'White' ,self.rect, 2, 2)
+        return self.rect
@@ -0,0 +1,109 @@
+from settings import *
+from time import perf_counter
+from assets import assets
+import json
+
+# frame phases in the order they run
+PHASES = ('events', 'input', 'timers', 'sprites', 'draw', 'panels', 'display')
+
+
+class FrameProfiler:
+    def __init__(self, size: int = PROFILE_FRAMES, path: str = None) -> None:
+        """
+        Records how long each phase of the last frames took in a fixed-size ring buffer.
+        Components only call it when one is attached, so a disabled profiler costs one check per phase.
+
+        :param size: number of frames kept
+        :param path: file the buffer is written to by dump(), nothing is written if omitted
+        """
+        self.size = size
+        self.path = path
+        self.phases = {phase: [0.0] * size for phase in PHASES}
+        self.frames = [0.0] * size
+        self.index = 0
+        self.count = 0
+
+        # current frame
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = 0.0
+        self.last = 0.0
+
+        # overlay
+        self.overlay = False
+        self.font = assets.font(14)
+        self.overlay_surface = None
+
+    def begin_frame(self) -> None:
+        self.frame_start = self.last = perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """
+        Adds the time since the previous mark to a phase, phases run several times a frame add up
+        :param phase: one of PHASES
+        """
+        now = perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self) -> None:
+        """
+        Stores the current frame in the ring buffer, in milliseconds
+        """
+        index = self.index
+        for phase, duration in self.current.items():
+            self.phases[phase][index] = duration * 1000
+            self.current[phase] = 0.0
+        self.frames[index] = (perf_counter() - self.frame_start) * 1000
+
+        self.index = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        if self.overlay and self.index % PROFILE_OVERLAY_INTERVAL == 0:
+            self.overlay_surface = None
+
+    def recorded(self, values: list) -> list:
+        """
+        Values of the recorded frames, oldest first
+        """
+        if self.count < self.size:
+            return values[:self.count]
+        return values[self.index:] + values[:self.index]
+
+    def percentile(self, values: list, fraction: float) -> float:
+        values = sorted(self.recorded(values))
+        return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+    def stats(self) -> dict:
+        """
+        p50 and p99 in milliseconds of the whole frame and of every phase
+        """
+        stats = {'frame': (self.percentile(self.frames, 0.5), self.percentile(self.frames, 0.99))}
+        for phase, values in self.phases.items():
+            stats[phase] = (self.percentile(values, 0.5), self.percentile(values, 0.99))
+        return stats
+
+    def draw(self, surface: pygame.Surface) -> pygame.Rect:
+        """
+        Draws the stats overlay in the top left corner, re-rendered every PROFILE_OVERLAY_INTERVAL frames
+        :return: the overlay rect
+        """
+        if self.overlay_surface is None:
+            lines = [f'{name} p50 {p50:.2f} p99 {p99:.2f} ms' for name, (p50, p99) in self.stats().items()]
+            height = self.font.get_linesize()
+            self.overlay_surface = pygame.Surface((220, height * len(lines) + 8))
+            self.overlay_surface.fill('Black')
+            for i, line in enumerate(lines):
+                self.overlay_surface.blit(self.font.render(line, True, 'White'), (4, 4 + i * height))
+        return surface.blit(self.overlay_surface, (PADDING, PADDING))
+
+    def dump(self) -> None:
+        """
+        Writes the recorded frames to the profile file as JSON
+        """
+        if not self.path:
+            return
+        data = {'frame': self.recorded(self.frames)}
+        for phase, values in self.phases.items():
+            data[phase] = self.recorded(values)
+        data['stats'] = self.stats()
+        with open(self.path, 'w') as file:
+            json.dump(data, file)
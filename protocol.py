@@ -0,0 +1,97 @@
+from settings import *
+import struct
+
+from board import SHAPES
+
+# every message is a (type, payload length) header followed by the payload
+FRAME = struct.Struct('<BH')
+
+# client -> server
+MSG_JOIN = 1        # player name, utf-8
+MSG_INPUT = 2       # held and pressed key masks following controls.INPUT_KEYS
+# server -> client
+MSG_WELCOME = 3     # session id and randomizer seed
+MSG_STATE = 4       # STATE header followed by the rows that changed since the last state
+
+WELCOME = struct.Struct('<II')
+INPUT = struct.Struct('<BB')
+# tick, score, lines, level, pieces, shape, rotation, x, y, preview shapes, game over, row count
+STATE = struct.Struct(f'<IIIHIBBbb{PREVIEW_SHAPES}BBB')
+ROW = struct.Struct(f'<B{COLUMNS}s')
+
+
+def frame(kind: int, payload: bytes = b'') -> bytes:
+    """
+    Prefixes a payload with its message header
+    :param kind: one of the MSG_ constants
+    """
+    return FRAME.pack(kind, len(payload)) + payload
+
+
+def state_header(engine, tick: int, next_shapes: list) -> tuple:
+    """
+    Fields of a state message that describe everything except the board
+    :param engine: engine of the session
+    :param tick: number of ticks the session has run
+    :param next_shapes: preview queue of the session's randomizer
+    """
+    piece = engine.piece
+    return (tick, engine.current_score, engine.current_lines, engine.current_lvl, engine.pieces,
+            SHAPES.index(piece.shape), piece.rotation, piece.x, piece.y,
+            *(SHAPES.index(shape) for shape in next_shapes[:PREVIEW_SHAPES]), engine.game_over)
+
+
+def encode_state(header: tuple, rows: list) -> bytes:
+    """
+    Builds a state message
+    :param header: tuple from state_header()
+    :param rows: list of (y, row) pairs, row holding COLUMNS shape indexes
+    """
+    payload = bytearray(STATE.pack(*header, len(rows)))
+    for y, row in rows:
+        payload += ROW.pack(y, bytes(row))
+    return frame(MSG_STATE, bytes(payload))
+
+
+def decode_state(payload: bytes) -> dict:
+    """
+    Parses a state message payload
+    :return: dict with the header fields by name and the list of changed (y, row) pairs
+    """
+    fields = STATE.unpack_from(payload)
+    tick, score, lines, lvl, pieces, shape, rotation, x, y = fields[:9]
+    next_shapes = fields[9:9 + PREVIEW_SHAPES]
+    game_over, count = fields[9 + PREVIEW_SHAPES:]
+    rows = [ROW.unpack_from(payload, STATE.size + i * ROW.size) for i in range(count)]
+    return {
+        'tick': tick, 'score': score, 'lines': lines, 'lvl': lvl, 'pieces': pieces,
+        'shape': SHAPES[shape], 'rotation': rotation, 'x': x, 'y': y,
+        'next_shapes': [SHAPES[index] for index in next_shapes],
+        'game_over': bool(game_over), 'rows': rows,
+    }
+
+
+class FrameBuffer:
+    def __init__(self) -> None:
+        """
+        Reassembles messages from a byte stream that may split or merge them
+        """
+        self.data = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """
+        Adds received bytes
+        :return: list of (type, payload) for every message completed by them
+        """
+        self.data += data
+        messages = []
+        pos = 0
+        while len(self.data) - pos >= FRAME.size:
+            kind, length = FRAME.unpack_from(self.data, pos)
+            end = pos + FRAME.size + length
+            if end > len(self.data):
+                break
+            messages.append((kind, bytes(self.data[pos + FRAME.size:end])))
+            pos = end
+        del self.data[:pos]
+        return messages
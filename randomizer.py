@@ -0,0 +1,148 @@
+from settings import *
+from collections import deque
+from itertools import islice
+from random import Random
+
+SHAPES = list(TETROMINOS.keys())
+
+
+class BagGenerator:
+    def __init__(self, rng: Random) -> None:
+        """
+        Deals every shape once per shuffled bag of seven
+
+        :param rng: random source shared with the randomizer
+        """
+        self.rng = rng
+
+    def generate(self) -> list:
+        """
+        Next bag, in dealing order
+        """
+        bag = SHAPES[:]
+        self.rng.shuffle(bag)
+        return bag
+
+
+class HistoryGenerator:
+    def __init__(self, rng: Random) -> None:
+        """
+        Rerolls shapes that were dealt recently, so droughts and repeats are rare but the
+        order is never as predictable as a bag
+
+        :param rng: random source shared with the randomizer
+        """
+        self.rng = rng
+        # starting with S and Z in the history keeps them from opening the game
+        self.history = deque(HISTORY_START, maxlen=HISTORY_SIZE)
+
+    def generate(self) -> list:
+        """
+        Next shape, rolled up to HISTORY_ROLLS times until it is not in the history
+        """
+        for roll in range(HISTORY_ROLLS):
+            shape = self.rng.choice(SHAPES)
+            if shape not in self.history:
+                break
+        self.history.append(shape)
+        return [shape]
+
+
+class RandomGenerator:
+    def __init__(self, rng: Random) -> None:
+        """
+        Deals every shape independently with equal odds
+
+        :param rng: random source shared with the randomizer
+        """
+        self.rng = rng
+
+    def generate(self) -> list:
+        return [self.rng.choice(SHAPES)]
+
+
+GENERATORS = {
+    'bag': BagGenerator,
+    'history': HistoryGenerator,
+    'random': RandomGenerator,
+}
+
+
+class Randomizer:
+    def __init__(self, seed: int = None, generator: str = RANDOMIZER) -> None:
+        """
+        Seeded stream of shapes. Generated shapes wait in a queue, so any number of them can be
+        looked at before they are dealt and dealing one is a constant time pop.
+
+        :param seed: seed of the random source, the same seed and generator deal the same shapes
+        :param generator: name of the generator in GENERATORS
+        """
+        if generator not in GENERATORS:
+            raise ValueError(f'unknown randomizer {generator!r}, expected one of {", ".join(GENERATORS)}')
+        self.seed = seed
+        self.name = generator
+        self.rng = Random(seed)
+        self.generator = GENERATORS[generator](self.rng)
+        self.queue = deque()
+        # generator calls made so far, which with the seed pins down the random state
+        self.generated = 0
+
+    def fill(self, count: int) -> None:
+        """
+        Generates shapes until at least count are queued
+        """
+        queue = self.queue
+        generate = self.generator.generate
+        calls = 0
+        while len(queue) < count:
+            queue.extend(generate())
+            calls += 1
+        self.generated += calls
+
+    def rewind(self, seed: int, generated: int) -> None:
+        """
+        Puts the random source and generator back where they were after a number of
+        generator calls from a seed. The queue is left to the caller.
+
+        :param seed: seed the stream started from
+        :param generated: number of generator calls to replay
+        """
+        self.seed = seed
+        self.rng.seed(seed)
+        self.generator = GENERATORS[self.name](self.rng)
+        generate = self.generator.generate
+        for call in range(generated):
+            generate()
+        self.generated = generated
+
+    def get_next_shape(self) -> str:
+        """
+        Deals the next shape
+        """
+        if not self.queue:
+            self.fill(1)
+        return self.queue.popleft()
+
+    def peek(self, depth: int) -> list:
+        """
+        Upcoming shapes without dealing them
+        :param depth: number of shapes to look ahead
+        """
+        self.fill(depth)
+        return list(islice(self.queue, depth))
+
+    @property
+    def next_shapes(self) -> list:
+        """
+        Shapes in the preview queue
+        """
+        return self.peek(PREVIEW_SHAPES)
+
+    def generate(self, count: int) -> list:
+        """
+        Deals a long run of shapes at once, e.g. to pre-generate the sequence of a simulation
+        :param count: number of shapes to deal
+        """
+        self.fill(count)
+        popleft = self.queue.popleft
+        return [popleft() for i in range(count)]
@@ -0,0 +1,170 @@
+from settings import *
+import struct
+import sys
+import os
+
+from game import Game
+from randomizer import Randomizer
+from controls import INPUT_KEYS
+
+# Replay file layout: header, then (run length, tick input) varint pairs. A tick's input is
+# its held key mask in the low bits and the mask of keys pressed during it above them.
+MAGIC = b'TRPL'
+VERSION = 3
+PRESSED_SHIFT = len(INPUT_KEYS)
+HEADER = struct.Struct('<4sBIIIII')
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, pos: int) -> tuple:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Recorder:
+    def __init__(self, seed: int) -> None:
+        """
+        Collects the per-tick input of a game as run-length encoded masks
+
+        :param seed: seed of the game's randomizer
+        """
+        self.seed = seed
+        self.runs = []
+        self.ticks = 0
+
+    def record(self, held: int, pressed: int) -> None:
+        """
+        Adds one tick of input
+        :param held: mask of the keys held at the end of the tick
+        :param pressed: mask of the keys that went down during the tick
+        """
+        mask = held | pressed << PRESSED_SHIFT
+        if self.runs and self.runs[-1][0] == mask:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([mask, 1])
+        self.ticks += 1
+
+    def to_bytes(self, engine) -> bytes:
+        """
+        Serializes the recording along with the final result to verify against
+        :param engine: engine of the finished game
+        """
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.ticks,
+                                    engine.current_score, engine.current_lines, engine.current_lvl))
+        for mask, count in self.runs:
+            write_varint(out, count)
+            write_varint(out, mask)
+        return bytes(out)
+
+    def save(self, path: str, engine) -> None:
+        """
+        Writes the recording to a file
+        :param path: destination file
+        :param engine: engine of the finished game
+        """
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes(engine))
+
+
+def replay_path(folder: str, seed: int, name: str) -> str:
+    """
+    File a game's recording is saved to, named after its seed and player
+    :param folder: replay folder
+    :param seed: seed of the game's randomizer
+    :param name: player name, reduced to its letters and digits
+    """
+    name = ''.join(char for char in name if char.isalnum()) or 'player'
+    return os.path.join(folder, f'{seed:08x}_{name}.replay')
+
+
+def load(data: bytes) -> dict:
+    """
+    Parses a serialized recording
+    :param data: bytes produced by Recorder.to_bytes
+    :return: dict with the seed, tick count, expected result and the list of (mask, count) runs
+    """
+    if len(data) < HEADER.size:
+        raise ValueError('not a replay file')
+    magic, version, seed, ticks, score, lines, lvl = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a replay file')
+    if version != VERSION:
+        # version 1 was recorded with the old timer-gated input, version 2 dealt the first piece
+        # outside the piece bag, neither can be played back
+        raise ValueError(f'unsupported replay version {version}')
+
+    runs = []
+    pos = HEADER.size
+    while pos < len(data):
+        count, pos = read_varint(data, pos)
+        mask, pos = read_varint(data, pos)
+        runs.append((mask, count))
+    return {'seed': seed, 'ticks': ticks, 'score': score, 'lines': lines, 'lvl': lvl, 'runs': runs}
+
+
+def new_game(seed: int) -> Game:
+    """
+    Builds a game with the same seeded piece order Main uses
+    :param seed: randomizer seed
+    """
+    return Game(Randomizer(seed).get_next_shape, None)
+
+
+def replay(recording: dict) -> Game:
+    """
+    Feeds a recording's inputs back into a headless game as fast as possible
+    :param recording: dict from load()
+    :return: the game after the last recorded tick
+    """
+    game = new_game(recording['seed'])
+    held_mask = (1 << PRESSED_SHIFT) - 1
+    for mask, count in recording['runs']:
+        held, pressed = mask & held_mask, mask >> PRESSED_SHIFT
+        for tick in range(count):
+            game.update(held, pressed)
+    return game
+
+
+def verify(path: str) -> tuple:
+    """
+    Replays a recording file and checks the result against the one saved with it
+    :param path: replay file
+    :return: (matches, expected, actual) where expected and actual are (score, lines, level)
+    """
+    with open(path, 'rb') as file:
+        recording = load(file.read())
+    engine = replay(recording).engine
+    expected = (recording['score'], recording['lines'], recording['lvl'])
+    actual = (engine.current_score, engine.current_lines, engine.current_lvl)
+    return expected == actual, expected, actual
+
+
+if __name__ == '__main__':
+    failures = 0
+    skipped = 0
+    for path in sys.argv[1:]:
+        try:
+            matches, expected, actual = verify(path)
+        except ValueError as error:
+            # e.g. recorded by an older version, which cannot be played back
+            skipped += 1
+            print(f'SKIPPED {path}: {error}')
+            continue
+        if not matches:
+            failures += 1
+            print(f'MISMATCH {path}: expected {expected}, got {actual}')
+    checked = len(sys.argv) - 1 - skipped
+    print(f'{checked - failures}/{checked} replays verified, {skipped} skipped')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,83 @@
+from settings import *
+
+# Offsets tried in order when a rotation collides, so pieces can rotate off walls and the stack
+KICKS = [(0, 0), (-1, 0), (1, 0), (0, -1), (-2, 0), (2, 0)]
+
+
+def rotate_offsets(offsets: list) -> list:
+    """
+    Rotates block offsets 90 degrees clockwise around the first block
+    :param offsets: list of (x, y) tuples
+    :return: list of rotated (x, y) tuples
+    """
+    pivot_x, pivot_y = offsets[0]
+    return [(pivot_x - (dy - pivot_y), pivot_y + (dx - pivot_x)) for dx, dy in offsets]
+
+
+def piece_mask(offsets: list) -> tuple:
+    """
+    Packs block offsets into row bitmasks for collision checks against a BitBoard
+    :param offsets: list of (x, y) tuples
+    :return: (left, right, bottom, rows) where rows is a tuple of (dy, bits) and bits start at column left
+    """
+    left = min(dx for dx, dy in offsets)
+    right = max(dx for dx, dy in offsets)
+    bottom = max(dy for dx, dy in offsets)
+    rows = {}
+    for dx, dy in offsets:
+        rows[dy] = rows.get(dy, 0) | (1 << (dx - left))
+    return left, right, bottom, tuple(sorted(rows.items()))
+
+
+def build_rotations() -> dict:
+    """
+    Generates every orientation of each shape in TETROMINOS, the "O" piece only has one
+    :return: dict mapping shape to a list of offset lists indexed by rotation
+    """
+    rotations = {}
+    for shape, data in TETROMINOS.items():
+        states = [list(data['shape'])]
+        if shape != 'O':
+            for i in range(3):
+                states.append(rotate_offsets(states[-1]))
+        rotations[shape] = states
+    return rotations
+
+
+def column_bottoms(offsets: list) -> tuple:
+    """
+    Lowest block of each column a piece covers, for drop distance queries
+    :param offsets: list of (x, y) tuples
+    :return: tuple of (dx, dy) pairs, one per column
+    """
+    bottoms = {}
+    for dx, dy in offsets:
+        bottoms[dx] = max(bottoms.get(dx, dy), dy)
+    return tuple(sorted(bottoms.items()))
+
+
+ROTATIONS = build_rotations()
+MASKS = {shape: [piece_mask(offsets) for offsets in states] for shape, states in ROTATIONS.items()}
+BOTTOMS = {shape: [column_bottoms(offsets) for offsets in states] for shape, states in ROTATIONS.items()}
+
+
+def rotate_with_kicks(board, shape: str, rotation: int, x: int, y: int) -> tuple:
+    """
+    Rotates a piece clockwise, trying each wall kick in turn
+    :param board: BitBoard to check collisions against
+    :param shape: letter of the piece's shape
+    :param rotation: current rotation index
+    :param x: x-coord of the piece's pivot
+    :param y: y-coord of the piece's pivot
+    :return: (rotation, x, y) after the rotation, or None if it is blocked or the shape has one orientation
+    """
+    states = MASKS[shape]
+    if len(states) == 1:
+        return None
+
+    rotation = (rotation + 1) % len(states)
+    mask = states[rotation]
+    for kick_x, kick_y in KICKS:
+        if not board.collides_mask(mask, x + kick_x, y + kick_y):
+            return rotation, x + kick_x, y + kick_y
+    return None
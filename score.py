@@ -1,6 +1,8 @@
 import pygame.display
 from settings import *
-from os.path import join
+from textcache import text_cache
+from assets import assets
+from events import EventBus, LinesCleared, LevelUp
 
 class Score:
     def __init__(self) -> None:
@@ -12,7 +14,7 @@ class Score:
         self.rect = self.surface.get_rect(bottomright = (WINDOW_WIDTH - PADDING, WINDOW_HEIGHT - PADDING))
 
         #font
-        self.font = pygame.font.Font(join('graphics', 'Russo_One.ttf'),20)
+        self.font = assets.font(20)
 
         #display
         self.increment_height = self.surface.get_height() / 3
@@ -21,6 +23,29 @@ class Score:
         self.score = 0
         self.lvl = 1
         self.lines = 0
+        self.drawn_values = None
+
+    def subscribe(self, events: EventBus) -> None:
+        """
+        Follows the score, lines and level of the games publishing on a bus
+        """
+        events.subscribe(LinesCleared, self.lines_cleared)
+        events.subscribe(LevelUp, self.level_up)
+
+    def lines_cleared(self, event: LinesCleared) -> None:
+        self.lines = event.lines
+        self.score = event.score
+
+    def level_up(self, event: LevelUp) -> None:
+        self.lvl = event.lvl
+
+    def reset(self) -> None:
+        """
+        Starting values for a new game
+        """
+        self.score = 0
+        self.lvl = 1
+        self.lines = 0
 
     def display_text(self, pos: tuple, text: str) -> None:
         """
@@ -28,14 +53,20 @@ class Score:
         :param pos: on screen coords
         :param text: text to display
         """
-        text_surface = self.font.render(f'{text[0]}:{text[1]}', True, 'White')
+        text_surface = text_cache.render(self.font, f'{text[0]}:{text[1]}')
         text_rect = text_surface.get_rect(center= pos)
         self.surface.blit(text_surface, text_rect)
 
-    def run(self) -> None:
+    def run(self) -> pygame.Rect:
         """
         Runs update loop for score display
+        :return: the panel rect if it was redrawn, otherwise None
         """
+        values = (self.score, self.lvl, self.lines)
+        if values == self.drawn_values:
+            return None
+        self.drawn_values = values
+
         self.surface.fill('Gray')
         for i, text in enumerate([('Score', self.score), ('Level', self.lvl), ('Lines', self.lines)]):
             x = self.surface.get_width() / 2
@@ -43,4 +74,5 @@ class Score:
             self.display_text((x,y), text)
 
         self.display_surface.blit(self.surface, self.rect)
-        pygame.draw.rect(self.display_surface, 'White', self.rect, 2, 2)
\ No newline at end of file
+        pygame.draw.rect(self.display_surface, 'White', self.rect, 2, 2)
+        return self.rect
@@ -0,0 +1,163 @@
+from settings import *
+import sqlite3
+import csv
+import sys
+import os
+import re
+
+# header of the legacy CSV, written as both LVL and LEVEL
+HEADER_PATTERN = re.compile(r'^NAME,SCORE,(?:LVL|LEVEL),LINES', re.IGNORECASE)
+# legacy rows were appended without newlines, so each row's LINES runs into the next NAME
+ROW_PATTERN = re.compile(r'([^,\r\n]*?),(\d+),(\d+),(\d+)(?=\D|$)')
+
+
+def parse_legacy_csv(text: str) -> list:
+    """
+    Recovers the rows of a scoreboard CSV, including rows that were concatenated onto one line
+    :param text: contents of the CSV file
+    :return: list of (name, score, level, lines)
+    """
+    rows = []
+    for line in text.splitlines():
+        line = HEADER_PATTERN.sub('', line.strip())
+        if not line:
+            continue
+
+        fields = next(csv.reader([line]))
+        if len(fields) == 4 and all(field.isdigit() for field in fields[1:]):
+            rows.append((fields[0], int(fields[1]), int(fields[2]), int(fields[3])))
+        else:
+            for name, score, level, lines in ROW_PATTERN.findall(line):
+                rows.append((name, int(score), int(level), int(lines)))
+    return rows
+
+
+class ScoreStore:
+    def __init__(self, path: str = SCOREBOARD_DB) -> None:
+        """
+        Opens the shared scoreboard database, creating it if needed. SQLite in WAL mode lets
+        many game instances append concurrently while readers keep using the indexes.
+
+        :param path: database file
+        """
+        self.connection = sqlite3.connect(path, timeout=SCOREBOARD_TIMEOUT, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS scores (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                level INTEGER NOT NULL,
+                lines INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+            CREATE INDEX IF NOT EXISTS scores_by_name ON scores (name, score DESC);
+            CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY);
+        ''')
+
+    def add(self, score_data: tuple) -> None:
+        """
+        Stores a single result
+        :param score_data: (name, score, level, lines)
+        """
+        self.add_many([score_data])
+
+    def add_many(self, rows: list) -> None:
+        """
+        Stores several results in one transaction
+        :param rows: list of (name, score, level, lines)
+        """
+        rows = [(str(name), int(score), int(level), int(lines)) for name, score, level, lines in rows]
+        with self.transaction():
+            self.connection.executemany('INSERT INTO scores (name, score, level, lines) VALUES (?, ?, ?, ?)', rows)
+
+    def transaction(self) -> 'Transaction':
+        return Transaction(self.connection)
+
+    def top(self, n: int = 5) -> list:
+        """
+        Best results, highest score first
+        :return: list of (id, name, score, level, lines)
+        """
+        return self.connection.execute(
+            'SELECT id, name, score, level, lines FROM scores ORDER BY score DESC, id LIMIT ?', (n,)).fetchall()
+
+    def player_bests(self) -> list:
+        """
+        Best result of every player
+        :return: list of (id, name, score, level, lines)
+        """
+        return self.connection.execute(
+            'SELECT id, name, MAX(score), level, lines FROM scores GROUP BY name').fetchall()
+
+    def load(self, n: int = 5) -> tuple:
+        """
+        Best results, every player's best and the newest row id, read from one snapshot of the
+        database so a row committed meanwhile is either in all of them or in none
+        :return: (top(n), player_bests(), last row id or 0)
+        """
+        self.connection.execute('BEGIN')
+        try:
+            top = self.top(n)
+            bests = self.player_bests()
+            last_id = self.connection.execute('SELECT MAX(id) FROM scores').fetchone()[0]
+        finally:
+            self.connection.execute('COMMIT')
+        return top, bests, last_id or 0
+
+    def since(self, last_id: int) -> list:
+        """
+        Results stored after a known row, used to pick up other instances' writes
+        :return: list of (id, name, score, level, lines) in insertion order
+        """
+        return self.connection.execute(
+            'SELECT id, name, score, level, lines FROM scores WHERE id > ? ORDER BY id', (last_id,)).fetchall()
+
+    def import_csv(self, path: str) -> int:
+        """
+        One-time import of a legacy scoreboard CSV, skipped if the file was imported before
+        :param path: CSV file
+        :return: number of rows imported
+        """
+        key = os.path.abspath(path)
+        # checked before reading, so startup does not parse a large legacy file every launch
+        if self.connection.execute('SELECT 1 FROM imports WHERE path = ?', (key,)).fetchone():
+            return 0
+        try:
+            with open(path, 'r', newline='') as file:
+                rows = parse_legacy_csv(file.read())
+        except FileNotFoundError:
+            return 0
+
+        with self.transaction():
+            # another instance may have imported it since the check
+            imported = self.connection.execute('INSERT OR IGNORE INTO imports (path) VALUES (?)', (key,))
+            if imported.rowcount == 0:
+                return 0
+            self.connection.executemany('INSERT INTO scores (name, score, level, lines) VALUES (?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class Transaction:
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        """
+        Write transaction that takes the database lock up front, so concurrent writers
+        wait on the busy timeout instead of failing partway through
+        """
+        self.connection = connection
+
+    def __enter__(self) -> None:
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+if __name__ == '__main__':
+    store = ScoreStore()
+    for path in sys.argv[1:] or [SCOREBOARD_FILE]:
+        print(f'{path}: imported {store.import_csv(path)} rows')
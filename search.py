@@ -0,0 +1,105 @@
+from settings import *
+from collections import deque
+
+from board import BitBoard
+from rotation import ROTATIONS, MASKS, rotate_with_kicks
+
+# moves explored from every state, matching the player's controls
+MOVES = ('left', 'right', 'down', 'rotate')
+
+# (rotation, x, y) of a newly spawned piece
+SPAWN = (0, int(BLOCK_OFFSET.x), int(BLOCK_OFFSET.y))
+
+
+class Placement:
+    def __init__(self, shape: str, rotation: int, x: int, y: int, path: list, board: BitBoard) -> None:
+        """
+        A reachable final position of a piece and the board it leaves behind
+
+        :param shape: letter of the piece's shape
+        :param rotation: rotation index of the landed piece
+        :param x: x-coord of the landed piece's pivot
+        :param y: y-coord of the landed piece's pivot
+        :param path: moves from the spawn position that reach this landing
+        :param board: board before the piece is locked
+        """
+        self.shape = shape
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+        self.path = path
+        self.cells = [(x + dx, y + dy) for dx, dy in ROTATIONS[shape][rotation]]
+        self.tops_out = any(y < 0 for x, y in self.cells)
+
+        # resulting board
+        self.board = board.copy()
+        full_rows = self.board.place([(x, y) for x, y in self.cells if y >= 0], shape)
+        self.board.clear_rows(full_rows)
+        self.lines = len(full_rows)
+
+
+def step(board: BitBoard, shape: str, state: tuple, move: str) -> tuple:
+    """
+    Applies one move with the engine's collision rules
+    :param state: (rotation, x, y)
+    :return: the new state, or None if the move is blocked
+    """
+    rotation, x, y = state
+    if move == 'rotate':
+        return rotate_with_kicks(board, shape, rotation, x, y)
+
+    if move == 'left':
+        x -= 1
+    elif move == 'right':
+        x += 1
+    else:
+        y += 1
+    if board.collides_mask(MASKS[shape][rotation], x, y):
+        return None
+    return rotation, x, y
+
+
+def placements(board: BitBoard, shape: str, start: tuple = None) -> list:
+    """
+    Breadth-first search over every (rotation, x, y) state a piece can reach, including
+    tucks under overhangs and kicked rotations, keeping each distinct landing once
+
+    :param board: board to search on
+    :param shape: letter of the piece's shape
+    :param start: (rotation, x, y) to search from, defaults to the spawn position
+    :return: list of Placement, with the shortest path to each landing
+    """
+    if start is None:
+        start = SPAWN
+    if board.collides_mask(MASKS[shape][start[0]], start[1], start[2]):
+        return []
+
+    parents = {start: None}
+    queue = deque([start])
+    landings = {}
+    while queue:
+        state = queue.popleft()
+        for move in MOVES:
+            next_state = step(board, shape, state, move)
+            if next_state is None:
+                if move == 'down':
+                    # equivalent landings cover the same cells from different pivots or rotations
+                    rotation, x, y = state
+                    cells = frozenset((x + dx, y + dy) for dx, dy in ROTATIONS[shape][rotation])
+                    if cells not in landings:
+                        landings[cells] = state
+                continue
+            if next_state not in parents:
+                parents[next_state] = (state, move)
+                queue.append(next_state)
+
+    results = []
+    for state in landings.values():
+        path = []
+        node = state
+        while parents[node]:
+            node, move = parents[node]
+            path.append(move)
+        path.reverse()
+        results.append(Placement(shape, *state, path, board))
+    return results
@@ -0,0 +1,284 @@
+from settings import *
+from random import Random, SystemRandom
+import argparse
+import asyncio
+import time
+import os
+
+from game import GameLogic
+from randomizer import Randomizer
+from replay import Recorder, replay_path
+from protocol import *
+
+
+class Session:
+    def __init__(self, session_id: int, seed: int, name: str, writer: asyncio.StreamWriter,
+                 record: bool = False) -> None:
+        """
+        One player's headless game, stepped by the server's scheduler
+
+        :param session_id: id sent back to the client
+        :param seed: randomizer seed, the session's inputs can be replayed from it
+        :param name: player name sent with the join message
+        :param writer: stream the session's states are written to
+        :param record: record the session's inputs so save_replay() can write them out
+        """
+        self.id = session_id
+        self.seed = seed
+        self.name = name
+        self.writer = writer
+
+        self.randomizer = Randomizer(seed)
+        self.logic = GameLogic(self.randomizer.get_next_shape, None)
+        self.logic.recorder = Recorder(seed) if record else None
+        self.held = 0
+        self.taps = 0
+        self.ticks = 0
+
+        # what the client has been sent so far
+        self.sent_rows = [None for y in range(ROWS)]
+        self.sent_hash = None
+        self.sent_header = None
+
+    def update(self) -> None:
+        """
+        Runs one fixed timestep with the last key state the client sent, and every press
+        received since the previous tick even if the key was already released
+        """
+        if not self.logic.engine.game_over:
+            self.logic.update(self.held, self.taps)
+            self.taps = 0
+            self.ticks += 1
+
+    def save_replay(self, folder: str) -> None:
+        """
+        Writes the session's recording to the replay folder, named like the ones Main saves
+        """
+        recorder = self.logic.recorder
+        if recorder is None or not recorder.ticks:
+            return
+        os.makedirs(folder, exist_ok=True)
+        recorder.save(replay_path(folder, self.seed, self.name), self.logic.engine)
+
+    def delta(self) -> bytes:
+        """
+        State message with only the rows that changed since the last one
+        :return: encoded message, or None if nothing changed
+        """
+        board = self.logic.engine.board
+        header = state_header(self.logic.engine, self.ticks, self.randomizer.next_shapes)
+        # rows are only compared once the board's hash says something was locked or cleared
+        rows = []
+        if board.hash != self.sent_hash:
+            rows = [(y, row) for y, row in enumerate(board.colors) if row != self.sent_rows[y]]
+            self.sent_hash = board.hash
+        # the tick counter alone is not worth a message
+        if not rows and self.sent_header and header[1:] == self.sent_header[1:]:
+            return None
+
+        for y, row in rows:
+            self.sent_rows[y] = bytes(row)
+        self.sent_header = header
+        return encode_state(header, rows)
+
+
+class Server:
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT, seed: int = None,
+                 replay_folder: str = REPLAY_FOLDER) -> None:
+        """
+        Hosts many games in one process: every session's game is stepped by a single
+        fixed-timestep scheduler and clients only receive the rows that changed
+
+        :param host: address to listen on
+        :param port: port to listen on
+        :param seed: seeds the session seeds, random if omitted
+        :param replay_folder: folder every session's replay is saved to when it ends, None to not record
+        """
+        self.host = host
+        self.port = port
+        self.replay_folder = replay_folder
+        self.rng = Random(seed) if seed is not None else SystemRandom()
+        self.sessions = {}
+        self.next_id = 1
+        self.ticks = 0
+
+        # stats since the last report
+        self.tick_time = 0
+        self.tick_max = 0
+        self.overruns = 0
+        self.bytes_sent = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves one client connection: a join message, then input messages until it disconnects
+        """
+        session = None
+        try:
+            kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+            payload = await reader.readexactly(length)
+            if kind != MSG_JOIN:
+                return
+
+            session = Session(self.next_id, self.rng.getrandbits(32), payload.decode('utf-8', 'replace'), writer,
+                              self.replay_folder is not None)
+            self.next_id += 1
+            self.sessions[session.id] = session
+            writer.write(frame(MSG_WELCOME, WELCOME.pack(session.id, session.seed)))
+
+            while True:
+                kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+                payload = await reader.readexactly(length)
+                if kind == MSG_INPUT:
+                    held, pressed = INPUT.unpack(payload)
+                    session.held = held
+                    session.taps |= pressed
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session:
+                del self.sessions[session.id]
+                if self.replay_folder is not None:
+                    session.save_replay(self.replay_folder)
+            writer.close()
+
+    def tick(self) -> None:
+        """
+        Steps every session once and sends out states every SEND_INTERVAL ticks
+        """
+        self.ticks += 1
+        for session in self.sessions.values():
+            session.update()
+
+        if self.ticks % SEND_INTERVAL == 0:
+            for session in self.sessions.values():
+                # a client that stops reading is skipped until it catches up, it then gets the combined delta
+                if session.writer.transport.get_write_buffer_size() > MAX_SEND_BUFFER:
+                    continue
+                message = session.delta()
+                if message:
+                    session.writer.write(message)
+                    self.bytes_sent += len(message)
+
+    async def schedule(self) -> None:
+        """
+        Runs tick() at TICK_RATE. When ticks take longer than their budget the scheduler
+        catches up, dropping the backlog beyond MAX_FRAME_TIME so the server never spirals.
+        """
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            start = time.perf_counter()
+            self.tick()
+            elapsed = time.perf_counter() - start
+            self.tick_time += elapsed
+            self.tick_max = max(self.tick_max, elapsed)
+
+            next_tick += TICK_DURATION / 1000
+            delay = next_tick - loop.time()
+            if delay < -MAX_FRAME_TIME / 1000:
+                self.overruns += 1
+                next_tick = loop.time()
+            await asyncio.sleep(max(0, delay))
+
+    async def report(self, interval: float) -> None:
+        """
+        Prints the scheduler load every interval seconds
+        """
+        last_ticks = self.ticks
+        while True:
+            await asyncio.sleep(interval)
+            ticks = self.ticks - last_ticks
+            last_ticks = self.ticks
+            print(f'{len(self.sessions)} sessions, {ticks / interval:.1f} ticks/s, '
+                  f'tick {self.tick_time / max(ticks, 1) * 1000:.2f} ms avg {self.tick_max * 1000:.2f} ms max, '
+                  f'{self.bytes_sent / interval / 1024:.1f} KiB/s, {self.overruns} overruns', flush=True)
+            self.tick_time = self.tick_max = self.bytes_sent = self.overruns = 0
+
+    async def serve(self, report_interval: float = 5) -> None:
+        """
+        Accepts clients and runs the scheduler until cancelled
+        :param report_interval: seconds between load reports, 0 to disable them
+        """
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        tasks = [self.schedule()]
+        if report_interval:
+            tasks.append(self.report(report_interval))
+        async with server:
+            await asyncio.gather(server.serve_forever(), *tasks)
+
+
+async def simulated_client(host: str, port: int, name: str, duration: float, rng: Random) -> dict:
+    """
+    Plays over the network by holding random keys, rejoining whenever its game ends
+
+    :param duration: seconds to play for
+    :param rng: random source for the key presses
+    :return: dict with the games played, states received and bytes received
+    """
+    stats = {'games': 0, 'states': 0, 'bytes': 0}
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(frame(MSG_JOIN, name.encode('utf-8')))
+        stats['games'] += 1
+
+        async def press_keys() -> None:
+            while True:
+                # mostly sideways moves and rotations, with an occasional drop
+                mask = rng.choice((0, 1, 2, 4, 8, 16, 0, 1, 2, 4))
+                writer.write(frame(MSG_INPUT, INPUT.pack(mask, 0)))
+                await asyncio.sleep(rng.uniform(0.05, 0.3))
+
+        presser = asyncio.create_task(press_keys())
+        try:
+            while time.perf_counter() < end:
+                kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+                payload = await reader.readexactly(length)
+                stats['bytes'] += FRAME.size + length
+                if kind == MSG_STATE:
+                    stats['states'] += 1
+                    if decode_state(payload)['game_over']:
+                        break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            presser.cancel()
+            writer.close()
+    return stats
+
+
+async def simulate(host: str, port: int, clients: int, duration: float, seed: int = 0) -> None:
+    """
+    Connects many simulated clients to a server and prints what they received
+    """
+    rng = Random(seed)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(simulated_client(host, port, f'bot{i}', duration, Random(rng.getrandbits(32)))
+                                     for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    states = sum(result['states'] for result in results)
+    received = sum(result['bytes'] for result in results)
+    print(f'{clients} clients, {sum(result["games"] for result in results)} games, '
+          f'{states / elapsed / clients:.1f} states/s per client, '
+          f'{received / max(states, 1):.1f} bytes per state, {received / elapsed / 1024:.1f} KiB/s total')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multiplayer Tetris server')
+    parser.add_argument('mode', choices=('serve', 'simulate'), help='run a server, or simulated clients against one')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--seed', type=int, help='seed for the session seeds or the simulated key presses')
+    parser.add_argument('--clients', type=int, default=100, help='number of simulated clients')
+    parser.add_argument('--duration', type=float, default=30, help='seconds the simulated clients play for')
+    parser.add_argument('--replays', default=REPLAY_FOLDER, help='folder to save session replays to')
+    parser.add_argument('--no-replays', action='store_true', help='do not record sessions, e.g. under simulated load')
+    args = parser.parse_args()
+
+    try:
+        if args.mode == 'serve':
+            asyncio.run(Server(args.host, args.port, args.seed, None if args.no_replays else args.replays).serve())
+        else:
+            asyncio.run(simulate(args.host, args.port, args.clients, args.duration, args.seed or 0))
+    except KeyboardInterrupt:
+        pass
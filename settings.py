@@ -20,10 +20,56 @@ WINDOW_HEIGHT = GAME_HEIGHT + (PADDING * 2)
 # Game Behavior
 UPDATE_START_SPEED = 500
 
-MOVE_WAIT_TIME = 100
-ROTATE_WAIT_TIME = 100
+# fixed timestep for game logic, in milliseconds
+TICK_RATE = 60
+TICK_DURATION = 1000 / TICK_RATE
+MAX_FRAME_TIME = 250
+
+ASSET_FOLDER = 'graphics'
+FONT_FILE = 'Russo_One.ttf'
+REPLAY_FOLDER = 'replays'
+CHECKPOINT_FILE = 'checkpoint.snap'
+SCOREBOARD_FILE = 'scoreboard.csv'
+SCOREBOARD_DB = 'scoreboard.db'
+SCOREBOARD_TIMEOUT = 30
+LEADERBOARD_SIZE = 100
+
+# delayed auto shift: how long a sideways key is held before it repeats, and the repeat interval.
+# An ARR of 0 slides the piece to the wall as soon as DAS is charged.
+DAS = 133
+ARR = 33
+LATENCY_SAMPLES = 600
+
+# idle screens sleep until an event, waking up for the name cursor blink or after IDLE_WAKE milliseconds
+CURSOR_BLINK = 500
+IDLE_WAKE = 1000
 BLOCK_OFFSET = pygame.Vector2(COLUMNS // 2, -2)
 
+# Piece randomizer: 'bag', 'history' or 'random', and how many upcoming shapes are previewed.
+# The history randomizer rerolls a shape up to HISTORY_ROLLS times while it is one of the last HISTORY_SIZE dealt.
+RANDOMIZER = 'bag'
+PREVIEW_SHAPES = 3
+HISTORY_SIZE = 4
+HISTORY_ROLLS = 6
+HISTORY_START = ('Z', 'S', 'S', 'Z')
+
+# Multiplayer server
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 7777
+SEND_INTERVAL = 2
+MAX_SEND_BUFFER = 64 * 1024
+
+# Bots
+# placement lists kept by the bot, one turn of lookahead searches needs about 40
+SEARCH_CACHE_SIZE = 256
+
+# Profiling
+PROFILE_FRAMES = 600
+PROFILE_OVERLAY_INTERVAL = 30
+
+# Text rendering
+TEXT_CACHE_SIZE = 128
+
 # Colors
 Yellow = "#f1e60d"
 Red = "#e51b20"
@@ -0,0 +1,214 @@
+from settings import *
+import struct
+
+from board import SHAPES
+from engine import Piece
+from game import Game
+from randomizer import GENERATORS
+from rotation import ROTATIONS
+from replay import write_varint, read_varint
+
+# Snapshot layout, fixed size so successive snapshots can be diffed byte for byte:
+# header, timers, randomizer queue, randomizer seed, then the board with one nibble per cell
+MAGIC = b'TSNP'
+VERSION = 4
+# magic, version, score, lines, level, pieces, game over, shape, rotation, x, y,
+# down speed, clock time, time accumulator, held keys, auto shift key, next auto shift
+HEADER = struct.Struct('<4sBIIHI?BBbbdddBBd')
+# active, start time, duration
+TIMER = struct.Struct('<?dd')
+TIMER_NAMES = ('vertical move',)
+# generator, number of queued shapes, the queue padded to QUEUE_SIZE. A bag queue peeked for
+# the preview holds at most the preview and the rest of one bag.
+QUEUE_SIZE = PREVIEW_SHAPES + len(SHAPES) - 1
+QUEUE = struct.Struct(f'<BB{QUEUE_SIZE}B')
+GENERATOR_NAMES = list(GENERATORS)
+# seed and number of generator calls, replayed on restore instead of storing the random state
+RNG = struct.Struct('<QI')
+BOARD_SIZE = ROWS * COLUMNS // 2
+SIZE = HEADER.size + TIMER.size * len(TIMER_NAMES) + QUEUE.size + RNG.size + BOARD_SIZE
+
+# deltas compare snapshots in blocks of this many bytes
+DELTA_BLOCK = 8
+
+
+def pack_board(board) -> bytes:
+    """
+    Packs the color plane two cells per byte, low nibble first
+    """
+    cells = b''.join(board.colors)
+    return bytes(cells[i] | cells[i + 1] << 4 for i in range(0, len(cells), 2))
+
+
+def unpack_board(data: bytes) -> list:
+    """
+    Inverse of pack_board
+    :return: list of ROWS rows of COLUMNS shape indexes
+    """
+    cells = bytearray()
+    for byte in data:
+        cells.append(byte & 0xF)
+        cells.append(byte >> 4)
+    return [cells[y * COLUMNS:(y + 1) * COLUMNS] for y in range(ROWS)]
+
+
+def pad(values: list, size: int) -> list:
+    """
+    Pads a list of shape indexes with zeros to a fixed length
+    """
+    if len(values) > size:
+        raise ValueError(f'{len(values)} shapes do not fit in a snapshot field of {size}')
+    return values + [0] * (size - len(values))
+
+
+def capture(logic, randomizer) -> bytes:
+    """
+    Encodes everything needed to resume a game exactly where it is
+    :param logic: GameLogic or Game
+    :param randomizer: randomizer dealing the game's shapes
+    :return: SIZE bytes
+    """
+    engine = logic.engine
+    piece = engine.piece
+    out = bytearray(HEADER.pack(
+        MAGIC, VERSION, engine.current_score, engine.current_lines, engine.current_lvl, engine.pieces,
+        engine.game_over, SHAPES.index(piece.shape), piece.rotation, piece.x, piece.y,
+        engine.down_speed, logic.clock(), logic.time_accumulator, logic.held, logic.shift, logic.next_shift))
+
+    for name in TIMER_NAMES:
+        timer = logic.timers[name]
+        out += TIMER.pack(timer.active, timer.start_time, timer.duration)
+
+    queue = [SHAPES.index(shape) for shape in randomizer.queue]
+    out += QUEUE.pack(GENERATOR_NAMES.index(randomizer.name), len(queue), *pad(queue, QUEUE_SIZE))
+
+    if randomizer.seed is None:
+        raise ValueError('only seeded randomizers can be captured')
+    out += RNG.pack(randomizer.seed, randomizer.generated)
+
+    out += pack_board(engine.board)
+    return bytes(out)
+
+
+def restore(logic, randomizer, data: bytes) -> None:
+    """
+    Loads a snapshot into an existing game and its randomizer
+    :param logic: GameLogic or Game whose engine was built around the randomizer
+    :param randomizer: randomizer dealing the game's shapes, using the generator the snapshot was taken with
+    :param data: bytes from capture()
+    """
+    if len(data) != SIZE:
+        raise ValueError('not a snapshot')
+    (magic, version, score, lines, lvl, pieces, game_over, shape, rotation, x, y,
+     down_speed, time, accumulator, held, shift, next_shift) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a snapshot')
+    # everything is unpacked and checked before the game is touched, so a bad snapshot changes nothing
+    pos = HEADER.size
+    timers = []
+    for name in TIMER_NAMES:
+        timers.append(TIMER.unpack_from(data, pos))
+        pos += TIMER.size
+    fields = QUEUE.unpack_from(data, pos)
+    pos += QUEUE.size
+    seed, generated = RNG.unpack_from(data, pos)
+    pos += RNG.size
+    rows = unpack_board(data[pos:pos + BOARD_SIZE])
+
+    generator, count, queue = fields[0], fields[1], fields[2:2 + fields[1]]
+    # every generator call deals at least one shape, and pieces + 1 were dealt besides the queue
+    if (generator >= len(GENERATOR_NAMES) or shape >= len(SHAPES) or rotation > 3 or count > QUEUE_SIZE
+            or generated > pieces + 1 + count or not 0 <= accumulator < TICK_DURATION
+            or any(index >= len(SHAPES) for index in queue)
+            or any(value > len(SHAPES) for row in rows for value in row)
+            or any(not 0 <= x + dx < COLUMNS or y + dy >= ROWS for dx, dy in ROTATIONS[SHAPES[shape]][rotation])):
+        raise ValueError('corrupt snapshot')
+    if GENERATOR_NAMES[generator] != randomizer.name:
+        raise ValueError(f'snapshot was taken with the {GENERATOR_NAMES[generator]} randomizer')
+
+    engine = logic.engine
+    engine.current_score, engine.current_lines, engine.current_lvl = score, lines, lvl
+    engine.pieces = pieces
+    engine.game_over = game_over
+    engine.down_speed = down_speed
+    engine.down_speed_faster = down_speed * 0.3
+    engine.piece = Piece(SHAPES[shape])
+    engine.piece.rotation, engine.piece.x, engine.piece.y = rotation, x, y
+    engine.locked_cells = []
+
+    logic.clock.time = time
+    logic.time_accumulator = accumulator
+    logic.held = held
+    logic.shift = shift
+    logic.next_shift = next_shift
+    for name, values in zip(TIMER_NAMES, timers):
+        timer = logic.timers[name]
+        timer.active, timer.start_time, timer.duration = values
+
+    randomizer.queue.clear()
+    randomizer.queue.extend(SHAPES[index] for index in queue)
+    randomizer.rewind(seed, generated)
+
+    for y, row in enumerate(rows):
+        engine.board.load_row(y, row)
+
+    if isinstance(logic, Game):
+        # the board surface and sprites no longer match the engine
+        logic.drawn_pieces = pieces
+        logic.drawn_lines = lines
+        logic.render_board()
+        logic.create_new_tetromino()
+        logic.full_redraw = True
+
+
+def encode_delta(previous: bytes, current: bytes) -> bytes:
+    """
+    Encodes the blocks of current that differ from previous, as (blocks skipped, blocks changed)
+    varint pairs each followed by the changed bytes
+    :param previous: snapshot the receiver already has
+    :param current: snapshot to send
+    """
+    if len(previous) != len(current):
+        raise ValueError('snapshots differ in size')
+
+    out = bytearray()
+    skipped = 0
+    block = 0
+    blocks = (len(current) + DELTA_BLOCK - 1) // DELTA_BLOCK
+    while block < blocks:
+        start = block * DELTA_BLOCK
+        if previous[start:start + DELTA_BLOCK] == current[start:start + DELTA_BLOCK]:
+            skipped += 1
+            block += 1
+            continue
+
+        end = block + 1
+        while end < blocks and previous[end * DELTA_BLOCK:(end + 1) * DELTA_BLOCK] != current[end * DELTA_BLOCK:(end + 1) * DELTA_BLOCK]:
+            end += 1
+        write_varint(out, skipped)
+        write_varint(out, end - block)
+        out += current[start:end * DELTA_BLOCK]
+        skipped = 0
+        block = end
+    return bytes(out)
+
+
+def apply_delta(previous: bytes, delta: bytes) -> bytes:
+    """
+    Rebuilds a snapshot from the previous one and a delta
+    :param previous: snapshot the delta was encoded against
+    :param delta: bytes from encode_delta()
+    """
+    current = bytearray(previous)
+    block = 0
+    pos = 0
+    while pos < len(delta):
+        skipped, pos = read_varint(delta, pos)
+        count, pos = read_varint(delta, pos)
+        block += skipped
+        start = block * DELTA_BLOCK
+        end = min(len(current), (block + count) * DELTA_BLOCK)
+        current[start:end] = delta[pos:pos + end - start]
+        pos += end - start
+        block += count
+    return bytes(current)
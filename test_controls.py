@@ -0,0 +1,43 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from settings import *
+from controls import InputHandler
+from game import GameLogic
+from randomizer import Randomizer
+
+
+def new_logic(ticks: int) -> GameLogic:
+    """
+    Headless game with an input handler, after some frames without input
+    """
+    logic = GameLogic(Randomizer(0).get_next_shape)
+    logic.input_handler = InputHandler()
+    for frame in range(ticks):
+        logic.advance(17)
+    return logic
+
+
+def tap(handler: InputHandler, key: int) -> None:
+    handler.handle(pygame.event.Event(pygame.KEYDOWN, key=key))
+    handler.handle(pygame.event.Event(pygame.KEYUP, key=key))
+
+
+def test_press_moves_piece_in_same_frame():
+    for frames in range(40):
+        logic = new_logic(frames)
+        x = logic.engine.piece.x
+        tap(logic.input_handler, pygame.K_LEFT)
+        assert logic.advance(17) >= 1
+        assert logic.engine.piece.x == x - 1, f'after {frames} frames'
+
+
+def test_press_waits_for_a_tick():
+    logic = new_logic(0)
+    x = logic.engine.piece.x
+    tap(logic.input_handler, pygame.K_LEFT)
+    assert logic.advance(TICK_DURATION / 2) == 0
+    assert logic.engine.piece.x == x
+    logic.advance(TICK_DURATION / 2)
+    assert logic.engine.piece.x == x - 1
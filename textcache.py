@@ -0,0 +1,41 @@
+from settings import *
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, max_size: int = TEXT_CACHE_SIZE) -> None:
+        """
+        Keeps rendered text surfaces so unchanged labels are not re-rendered every frame
+
+        :param max_size: number of surfaces kept before the least recently used one is dropped
+        """
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font: pygame.font.Font, text: str, color: str = 'White', antialias: bool = True) -> pygame.Surface:
+        """
+        Returns the rendered text, using the cached surface when there is one
+        :param font: font to render with
+        :param text: text to render
+        :param color: text color
+        :param antialias: whether to render with antialiasing
+        """
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+# shared by every screen and panel
+text_cache = TextCache()
@@ -1,28 +1,42 @@
 from settings import *
 
+class VirtualClock:
+    def __init__(self, start=0):
+        """
+        Millisecond clock that only moves when ticked, for running games faster than real time
+        """
+        self.time = start
+
+    def __call__(self):
+        return self.time
+
+    def tick(self, duration):
+        self.time += duration
+
 class Timer:
-    def __init__(self, duration, repeated=False, func=None):
+    def __init__(self, duration, repeated=False, func=None, clock=None):
         self.repeated = repeated
         self.func = func
         self.duration = duration
+        self.clock = clock if clock else pygame.time.get_ticks
 
         self.start_time = 0
         self.active = False
 
     def activate(self):
         self.active = True
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = self.clock()
 
     def deactivate(self):
         self.active = False
         self.start_time = 0
 
     def update(self):
-        current_time = pygame.time.get_ticks()
+        current_time = self.clock()
         if current_time - self.start_time >= self.duration and self.active:
 
             # call function
-            if self.func and self.start_time != 0:
+            if self.func:
                 self.func()
 
             # reset timer
@@ -30,4 +44,4 @@ class Timer:
 
             # repeat timer
             if self.repeated:
-                self.activate()
\ No newline at end of file
+                self.activate()
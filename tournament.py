@@ -0,0 +1,93 @@
+from settings import *
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from random import Random
+import argparse
+import json
+import os
+import sys
+import time
+
+from bot import DEFAULT_WEIGHTS, play_game
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of a list of numbers
+    :param fraction: 0 to 1
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(results: list) -> dict:
+    """
+    Aggregates per-game results
+    :return: dict mapping each stat to its mean and percentiles
+    """
+    summary = {}
+    for stat in ('score', 'lines', 'lvl', 'pieces', 'time'):
+        values = [result[stat] for result in results]
+        summary[stat] = {
+            'mean': sum(values) / len(values),
+            'p10': percentile(values, 0.10),
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'max': max(values),
+        }
+    return summary
+
+
+def run_tournament(games: int, weights: dict = None, seed: int = 0, workers: int = None,
+                   max_pieces: int = 1000, on_result: callable = None, lookahead: bool = False) -> list:
+    """
+    Plays headless bot games across a process pool, one game per task
+
+    :param games: number of games to play
+    :param weights: bot feature weights
+    :param seed: base seed, each game's randomizer seed is drawn from it
+    :param workers: number of processes, defaults to the CPU count
+    :param max_pieces: piece limit per game
+    :param on_result: called with each game's result and the number of finished games as they arrive
+    :param lookahead: let the bot look one previewed piece ahead
+    :return: list of result dicts in completion order
+    """
+    rng = Random(seed)
+    seeds = [rng.getrandbits(32) for game in range(games)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_game, game_seed, weights, max_pieces, lookahead) for game_seed in seeds]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(result, len(results))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run headless bot games in parallel')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-pieces', type=int, default=1000)
+    parser.add_argument('--lookahead', action='store_true', help='look one previewed piece ahead')
+    parser.add_argument('--weights', type=json.loads, default=DEFAULT_WEIGHTS, help='JSON object of feature weights')
+    parser.add_argument('--out', help='file to stream per-game results to as JSON lines')
+    args = parser.parse_args()
+
+    out = open(args.out, 'w') if args.out else None
+    start = time.perf_counter()
+
+    def report(result: dict, done: int) -> None:
+        if out:
+            out.write(json.dumps(result) + '\n')
+        rate = done / (time.perf_counter() - start)
+        print(f'\r{done}/{args.games} games, {rate:.1f} games/s', end='', file=sys.stderr)
+
+    results = run_tournament(args.games, args.weights, args.seed, args.workers, args.max_pieces, report,
+                             args.lookahead)
+    print(file=sys.stderr)
+    if out:
+        out.close()
+    print(json.dumps(summarize(results), indent=2))
@@ -0,0 +1,86 @@
+from settings import *
+from collections import OrderedDict
+from random import Random
+
+# fixed seed so hashes are stable across processes and runs
+ZOBRIST_SEED = 0x7E7215
+
+def build_keys() -> tuple:
+    """
+    Random 64-bit keys for every cell, tabulated per row mask, and for every piece orientation
+    :return: (cell_keys, row_keys, piece_keys)
+    """
+    rng = Random(ZOBRIST_SEED)
+    cell_keys = [[rng.getrandbits(64) for x in range(COLUMNS)] for y in range(ROWS)]
+
+    # row_keys[y][mask] is the xor of the keys of every cell set in mask
+    row_keys = []
+    for y in range(ROWS):
+        keys = [0] * (1 << COLUMNS)
+        for mask in range(1, 1 << COLUMNS):
+            low = mask & -mask
+            keys[mask] = keys[mask ^ low] ^ cell_keys[y][low.bit_length() - 1]
+        row_keys.append(keys)
+
+    piece_keys = {shape: [rng.getrandbits(64) for rotation in range(4)] for shape in TETROMINOS}
+    return cell_keys, row_keys, piece_keys
+
+
+CELL_KEYS, ROW_KEYS, PIECE_KEYS = build_keys()
+
+
+def board_hash(rows: list) -> int:
+    """
+    Zobrist hash of a board's filled cells, from its row bitmasks
+    """
+    value = 0
+    for y, row in enumerate(rows):
+        value ^= ROW_KEYS[y][row]
+    return value
+
+
+def state_hash(board, shape: str, rotation: int = 0) -> int:
+    """
+    Hash of a board together with the piece about to be played on it
+    :param board: BitBoard
+    :param shape: letter of the piece's shape
+    :param rotation: rotation index of the piece
+    """
+    return board.hash ^ PIECE_KEYS[shape][rotation]
+
+
+class EvalCache:
+    def __init__(self, max_size: int = SEARCH_CACHE_SIZE) -> None:
+        """
+        Transposition table keyed by Zobrist hash, bounded by LRU eviction
+
+        :param max_size: number of entries kept before the least recently used one is dropped
+        """
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: int, compute: callable):
+        """
+        Returns the cached value for a key, computing and storing it on a miss
+        :param key: Zobrist hash of the state
+        :param compute: called without arguments to produce the value
+        """
+        value = self.values.get(key)
+        if value is not None:
+            self.hits += 1
+            self.values.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = compute()
+        self.values[key] = value
+        if len(self.values) > self.max_size:
+            self.values.popitem(last=False)
+        return value
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0